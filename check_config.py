@@ -4,11 +4,14 @@
 用于诊断和修复常见的配置问题
 """
 
+import io
 import os
+import re
+import stat
 import sys
 import asyncio
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 # 颜色输出
 class Colors:
@@ -30,27 +33,43 @@ def print_header(title: str):
     """打印标题"""
     print(f"\n{Colors.BOLD}{Colors.BLUE}=== {title} ==={Colors.ENDC}")
 
+# .env 行格式: KEY=VALUE / KEY="VALUE" / KEY='VALUE'，引号外可跟 " # 注释"；注释行与不合法的键会被忽略
+_ENV_LINE_RE = re.compile(
+    r"""^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*"""
+    r"""(?:"([^"\n]*)"|'([^'\n]*)'|(.*?))"""
+    r"""(?:[ \t]+#[^\n]*)?[ \t\r]*$""",
+    re.M,
+)
+
+_ENV_SNIFF_BYTES = 8192
+
 def load_env_file() -> Dict[str, str]:
     """加载 .env 文件"""
-    env_vars = {}
     env_file = Path('.env')
     
     if not env_file.exists():
-        return env_vars
+        return {}
     
     try:
-        with open(env_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    # 移除引号
-                    value = value.strip('"\'')
-                    env_vars[key] = value
+        with env_file.open('rb') as f:
+            # 先读前 8KB 检查 NUL 字节，误放的二进制文件直接判失败，不再往下解析
+            head = f.read(_ENV_SNIFF_BYTES)
+            if b'\x00' in head:
+                raise ValueError(".env 文件疑似二进制文件（包含 NUL 字节）")
+            text = (head + f.read()).decode('utf-8')
     except Exception as e:
         print(f"{Colors.RED}读取 .env 文件失败: {e}{Colors.ENDC}")
-    
-    return env_vars
+        return {}
+
+    return {key: dq or sq or raw for key, dq, sq, raw in _ENV_LINE_RE.findall(text)}
+
+def _scan_cwd() -> Dict[str, os.DirEntry]:
+    """一次 scandir 读取当前目录，代替对每个文件单独 stat"""
+    try:
+        with os.scandir('.') as it:
+            return {entry.name: entry for entry in it}
+    except OSError:
+        return {}
 
 def check_basic_files() -> List[Tuple[str, bool, str]]:
     """检查基本文件"""
@@ -65,9 +84,9 @@ def check_basic_files() -> List[Tuple[str, bool, str]]:
         ('healthcheck.py', '健康检查脚本'),
     ]
     
+    entries = _scan_cwd()
     for filename, description in files_to_check:
-        path = Path(filename)
-        exists = path.exists()
+        exists = filename in entries
         details = description if exists else f"缺少 {description}"
         results.append((filename, exists, details))
     
@@ -79,11 +98,11 @@ def check_file_permissions() -> List[Tuple[str, bool, str]]:
     
     executable_files = ['deploy.sh', 'healthcheck.py']
     
+    entries = _scan_cwd()
     for filename in executable_files:
-        path = Path(filename)
-        if path.exists():
-            import stat
-            mode = path.stat().st_mode
+        entry = entries.get(filename)
+        if entry is not None:
+            mode = entry.stat().st_mode
             executable = bool(mode & stat.S_IXUSR)
             details = "有执行权限" if executable else "缺少执行权限，运行: chmod +x " + filename
             results.append((filename, executable, details))
@@ -92,43 +111,34 @@ def check_file_permissions() -> List[Tuple[str, bool, str]]:
     
     return results
 
+# 配置项表: (键, 默认占位值, 描述, 是否必需)；可选项没有占位值
+_ENV_CONFIGS: Tuple[Tuple[str, Optional[str], str, bool], ...] = (
+    ('BOT_TOKEN', 'YOUR_TELEGRAM_BOT_TOKEN', '机器人令牌', True),
+    ('BOT_USERNAME', 'your_bot_username', '机器人用户名', True),
+    ('CHANNEL_ID', '-1001234567890', '频道ID', True),
+    ('OPERATOR_USER_ID', None, '运营人员用户ID', False),
+    ('OPERATOR_USERNAME', None, '运营人员用户名', False),
+    ('ALLOWED_ADMIN_IDS', None, '管理员ID列表', False),
+    ('ALLOWED_USER_IDS', None, '用户白名单（兼容历史）', False),
+    ('ALLOW_ANYONE_APPLY', None, '是否允许任何人申请', False),
+)
+
 def check_env_config(env_vars: Dict[str, str]) -> List[Tuple[str, bool, str]]:
     """检查环境变量配置"""
     results = []
     
-    # 必需配置项
-    required_configs = [
-        ('BOT_TOKEN', 'YOUR_TELEGRAM_BOT_TOKEN', '机器人令牌'),
-        ('BOT_USERNAME', 'your_bot_username', '机器人用户名'),
-        ('CHANNEL_ID', '-1001234567890', '频道ID'),
-    ]
-    
-    for key, default_value, description in required_configs:
+    for key, default_value, description, required in _ENV_CONFIGS:
         value = env_vars.get(key, '')
-        is_configured = value and value != default_value
-        
-        if is_configured:
-            details = f"{description} 已配置"
+        if required:
+            is_configured = bool(value) and value != default_value
+            if is_configured:
+                details = f"{description} 已配置"
+            else:
+                details = f"{description} 未配置或使用默认值，请设置真实值"
+            results.append((key, is_configured, details))
         else:
-            details = f"{description} 未配置或使用默认值，请设置真实值"
-        
-        results.append((key, is_configured, details))
-    
-    # 可选配置项
-    optional_configs = [
-        ('OPERATOR_USER_ID', '运营人员用户ID'),
-        ('OPERATOR_USERNAME', '运营人员用户名'),
-        ('ALLOWED_ADMIN_IDS', '管理员ID列表'),
-        ('ALLOWED_USER_IDS', '用户白名单（兼容历史）'),
-        ('ALLOW_ANYONE_APPLY', '是否允许任何人申请'),
-    ]
-    
-    for key, description in optional_configs:
-        value = env_vars.get(key, '')
-        is_configured = bool(value.strip())
-        
-        details = f"{description} {'已配置' if is_configured else '未配置（可选）'}"
-        results.append((key, True, details))  # 可选项总是显示为通过
+            details = f"{description} {'已配置' if value.strip() else '未配置（可选）'}"
+            results.append((key, True, details))  # 可选项总是显示为通过
     
     return results
 
@@ -140,17 +150,19 @@ async def check_bot_connection(env_vars: Dict[str, str]) -> Tuple[bool, str]:
         return False, "BOT_TOKEN 未配置或为默认值"
     
     try:
-        # 尝试导入并测试连接
-        from aiogram import Bot
-        
-        bot = Bot(token=bot_token)
-        me = await bot.get_me()
-        await bot.session.close()
-        
-        return True, f"机器人连接成功: @{me.username} ({me.first_name})"
-    
-    except ImportError:
-        return False, "aiogram 库未安装，请运行: pip install aiogram"
+        # 直接请求 getMe，无需加载整个 aiogram；与 healthcheck.py 共用同一实现
+        from orderbot.src.utils.telegram_api import get_me
+    except ModuleNotFoundError as e:
+        if e.name == "aiohttp":
+            return False, "aiohttp 库未安装，请运行: pip install aiohttp"
+        return False, f"无法导入 Telegram API 工具: {e}"
+    except ImportError as e:
+        return False, f"无法导入 Telegram API 工具: {e}"
+
+    try:
+        me = await get_me(bot_token, timeout=5)
+        return True, f"机器人连接成功: @{me.get('username')} ({me.get('first_name')})"
+
     except Exception as e:
         return False, f"连接失败: {str(e)}"
 
@@ -168,37 +180,34 @@ def check_database_file() -> Tuple[bool, str]:
 
 def generate_fix_script(env_vars: Dict[str, str]) -> str:
     """生成修复脚本"""
-    script_lines = [
-        "#!/bin/bash",
-        "# 自动生成的配置修复脚本",
-        "echo '开始修复配置问题...'",
-        ""
-    ]
+    buf = io.StringIO()
+    w = buf.write
+    w("#!/bin/bash\n")
+    w("# 自动生成的配置修复脚本\n")
+    w("echo '开始修复配置问题...'\n")
+    w("\n")
     
     # 检查并修复文件权限
+    entries = _scan_cwd()
     for filename in ['deploy.sh', 'healthcheck.py']:
-        if Path(filename).exists():
-            script_lines.append(f"chmod +x {filename}")
-            script_lines.append(f"echo '✅ 已添加 {filename} 执行权限'")
+        if filename in entries:
+            w(f"chmod +x {filename}\n")
+            w(f"echo '✅ 已添加 {filename} 执行权限'\n")
     
     # 检查配置问题
     bot_token = env_vars.get('BOT_TOKEN', '')
     if not bot_token or bot_token == 'YOUR_TELEGRAM_BOT_TOKEN':
-        script_lines.extend([
-            "",
-            "echo '❌ 请手动设置 BOT_TOKEN:'",
-            "echo '1. 联系 @BotFather 获取机器人令牌'",
-            "echo '2. 编辑 .env 文件，替换 BOT_TOKEN 值'",
-            "echo '3. 重新运行此检查脚本'",
-        ])
+        w("\n")
+        w("echo '❌ 请手动设置 BOT_TOKEN:'\n")
+        w("echo '1. 联系 @BotFather 获取机器人令牌'\n")
+        w("echo '2. 编辑 .env 文件，替换 BOT_TOKEN 值'\n")
+        w("echo '3. 重新运行此检查脚本'\n")
     
-    script_lines.extend([
-        "",
-        "echo '修复脚本执行完成'",
-        "echo '请检查上述输出并手动完成剩余配置'"
-    ])
+    w("\n")
+    w("echo '修复脚本执行完成'\n")
+    w("echo '请检查上述输出并手动完成剩余配置'\n")
     
-    return "\n".join(script_lines)
+    return buf.getvalue()
 
 async def main():
     """主函数"""
@@ -222,6 +231,7 @@ async def main():
     
     # 检查环境配置
     print_header("环境配置检查")
+    config_results: List[Tuple[str, bool, str]] = []
     if env_vars:
         config_results = check_env_config(env_vars)
         for key, status, details in config_results:
@@ -247,12 +257,10 @@ async def main():
     
     # 统计问题
     all_results = file_results + perm_results
-    if env_vars:
-        # 只统计必需配置项的问题
-        required_keys = ['BOT_TOKEN', 'BOT_USERNAME', 'CHANNEL_ID']
-        config_results = check_env_config(env_vars)
-        required_results = [(k, s, d) for k, s, d in config_results if k in required_keys]
-        all_results.extend(required_results)
+    if config_results:
+        # 只统计必需配置项的问题（复用上面已计算的结果）
+        required_keys = {key for key, _, _, required in _ENV_CONFIGS if required}
+        all_results.extend(r for r in config_results if r[0] in required_keys)
     
     failed_checks = [r for r in all_results if not r[1]]
     
@@ -270,7 +278,6 @@ async def main():
                 f.write(fix_script)
             
             # 添加执行权限
-            import stat
             fix_script_path.chmod(fix_script_path.stat().st_mode | stat.S_IXUSR)
             
             print(f"\n{Colors.GREEN}已生成修复脚本: {fix_script_path}{Colors.ENDC}")
@@ -287,6 +294,13 @@ async def main():
         print(f"  Docker 生产: {Colors.YELLOW}./deploy.sh start --prod{Colors.ENDC}")
 
 if __name__ == '__main__':
+    # 可选：安装了 uvloop 时使用其事件循环（Windows 上不可用，忽略即可）
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -1,32 +1,121 @@
 #!/usr/bin/env python3
 
+import contextlib
 import os
 import sys
 import sqlite3
 import asyncio
-import aiohttp
+import importlib
+import platform
+import re
 import time
+from enum import Enum
 from pathlib import Path
-from typing import Dict, Any, Optional
-
-# 添加项目根目录到Python路径
-project_root = Path(__file__).parent
-sys.path.insert(0, str(project_root / "orderbot" / "src"))
+from types import ModuleType
+from typing import TYPE_CHECKING, Dict, Any, Optional, TextIO
 
 try:
-    from config import Settings
-    from core.db import init_engine, get_session, health_check as db_health_check
-    from utils.network import check_network_connectivity, network_monitor
-except ImportError as e:
-    print(f"❌ 无法导入配置: {e}")
-    sys.exit(1)
+    import psutil
+except ImportError:  # 在 __main__ 中给出安装提示
+    psutil = None
+
+if TYPE_CHECKING:
+    import aiohttp
+
+PROJECT_ROOT = Path(__file__).parent
+
+
+def load_project_module(name: str) -> ModuleType:
+    """按需导入 orderbot.src.<name>
+
+    SQLAlchemy、aiogram 等重量级依赖只在真正用到的检查里才加载，
+    仅做环境/文件检查时不必为此付出导入开销。
+    """
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
+    return importlib.import_module(f"orderbot.src.{name}")
+
+
+def sqlite_path_from_url(database_url: str) -> Optional[str]:
+    """从 sqlite:/// 或 sqlite+aiosqlite:/// URL 中取出数据库文件路径，非 SQLite 返回 None"""
+    scheme, sep, path = database_url.partition(":///")
+    if not sep or not scheme.startswith("sqlite"):
+        return None
+    return path
+
+
+def ping_sqlite(db_path: str, timeout: float = 1.0) -> None:
+    """以只读写(不创建)方式打开 SQLite 文件并执行 SELECT 1，失败时抛出异常"""
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=rw"
+    conn = sqlite3.connect(uri, uri=True, timeout=timeout)
+    try:
+        conn.execute("SELECT 1").fetchone()
+    finally:
+        conn.close()
+
+
+# Telegram Bot Token 形如 "<bot_id>:<35位左右的 base64url 串>"
+_BOT_TOKEN_RE = re.compile(r"^\d{5,15}:[A-Za-z0-9_-]{30,}$")
+
+
+def is_valid_bot_token(token: str) -> bool:
+    """校验 BOT_TOKEN 格式"""
+    return bool(_BOT_TOKEN_RE.match(token or ""))
+
+
+def _check_directory(path: str, description: str) -> Optional[str]:
+    """确认目录存在且可读写（不存在时尝试创建），返回问题描述或 None"""
+    if os.path.exists(path):
+        if not os.access(path, os.R_OK | os.W_OK):
+            return f"{description}权限不足"
+        return None
+    try:
+        os.makedirs(path, exist_ok=True)
+    except Exception as e:
+        return f"无法创建{description}: {str(e)}"
+    return None
+
+
+class ValidationMode(Enum):
+    """检查深度：FULL 完整检查；SKIP 结论会被后续检查覆盖，只做最廉价的部分"""
+    FULL = "full"
+    SKIP = "skip"
+
 
 class HealthChecker:
     """综合健康检查器"""
+
+    __slots__ = ("settings", "results", "_session")
+
+    # 需要检查的环境变量（属性名元组，避免每次检查时重建字典）
+    REQUIRED_VARS = ("BOT_TOKEN", "DATABASE_URL")
+    OPTIONAL_VARS = ("CHANNEL_ID", "OPERATOR_USER_ID", "LOG_LEVEL")
     
     def __init__(self):
-        self.settings = Settings()
+        try:
+            self.settings = load_project_module("config").get_settings()
+        except ImportError as e:
+            print(f"❌ 无法导入配置: {e}")
+            sys.exit(1)
         self.results: Dict[str, Dict[str, Any]] = {}
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    def session(self) -> "aiohttp.ClientSession":
+        """获取共享的HTTP会话（首次调用时创建），各项网络检查复用同一连接池"""
+        if self._session is None or self._session.closed:
+            import aiohttp
+            
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(total=10.0)
+            )
+        return self._session
+
+    async def aclose(self):
+        """关闭共享的HTTP会话"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
         
     def record_check(self, name: str, passed: bool, message: str, details: Optional[Dict] = None):
         """记录检查结果"""
@@ -38,29 +127,16 @@ class HealthChecker:
         }
         
         status = "✅" if passed else "❌"
-        print(f"{status} {name}: {message}")
-        
+        lines = [f"{status} {name}: {message}\n"]
         if details:
-            for key, value in details.items():
-                print(f"   {key}: {value}")
+            lines.extend(f"   {key}: {value}\n" for key, value in details.items())
+        # 整条结果一次写出，避免逐行 print 反复争用 stdout
+        sys.stdout.write("".join(lines))
     
     def check_environment(self):
         """检查环境变量"""
-        required_vars = {
-            "BOT_TOKEN": self.settings.BOT_TOKEN,
-            "DATABASE_URL": self.settings.DATABASE_URL,
-        }
-        
-        optional_vars = {
-            "CHANNEL_ID": self.settings.CHANNEL_ID,
-            "OPERATOR_USER_ID": self.settings.OPERATOR_USER_ID,
-            "LOG_LEVEL": self.settings.LOG_LEVEL,
-        }
-        
-        missing_required = []
-        for var_name, value in required_vars.items():
-            if not value:
-                missing_required.append(var_name)
+        settings = self.settings
+        missing_required = [name for name in self.REQUIRED_VARS if not getattr(settings, name)]
         
         if missing_required:
             self.record_check(
@@ -72,18 +148,18 @@ class HealthChecker:
             return False
         
         # 检查BOT_TOKEN格式
-        if len(self.settings.BOT_TOKEN) < 10 or ":" not in self.settings.BOT_TOKEN:
+        if not is_valid_bot_token(settings.BOT_TOKEN):
             self.record_check(
                 "环境变量",
                 False,
                 "BOT_TOKEN 格式不正确",
-                {"token_length": len(self.settings.BOT_TOKEN)}
+                {"token_length": len(settings.BOT_TOKEN)}
             )
             return False
         
         details = {
-            "required_vars": list(required_vars.keys()),
-            "optional_vars_set": [k for k, v in optional_vars.items() if v]
+            "required_vars": list(self.REQUIRED_VARS),
+            "optional_vars_set": [name for name in self.OPTIONAL_VARS if getattr(settings, name)]
         }
         
         self.record_check(
@@ -94,9 +170,13 @@ class HealthChecker:
         )
         return True
     
-    def check_database_file(self):
-        """检查数据库文件"""
-        db_path = self.settings.DATABASE_URL.replace("sqlite:///", "")
+    def check_database_file(self, mode: Optional[ValidationMode] = None):
+        """检查数据库文件
+
+        SKIP 模式只确认文件存在：读写权限由随后的数据库连接检查（以读写方式打开文件）覆盖。
+        """
+        mode = mode or ValidationMode.FULL
+        db_path = sqlite_path_from_url(self.settings.DATABASE_URL) or self.settings.DATABASE_URL
         
         # 检查数据库文件是否存在
         if not os.path.exists(db_path):
@@ -107,6 +187,15 @@ class HealthChecker:
             )
             return False
         
+        if mode is ValidationMode.SKIP:
+            self.record_check(
+                "数据库文件",
+                True,
+                "数据库文件存在（权限由连接检查验证）",
+                {"path": db_path}
+            )
+            return True
+        
         # 检查数据库文件权限
         if not os.access(db_path, os.R_OK | os.W_OK):
             self.record_check(
@@ -135,11 +224,19 @@ class HealthChecker:
     async def check_database_connection(self):
         """检查数据库连接"""
         try:
-            # 初始化数据库引擎
-            await init_engine(self.settings.DATABASE_URL)
-            
-            # 执行健康检查
-            is_healthy = await db_health_check()
+            db_path = sqlite_path_from_url(self.settings.DATABASE_URL)
+            if db_path is not None:
+                # SQLite 直接用标准库探活，不必创建 SQLAlchemy 引擎和建表
+                await asyncio.to_thread(ping_sqlite, db_path)
+                is_healthy = True
+            else:
+                db = load_project_module("core.db")
+                
+                # 初始化数据库引擎
+                await db.init_engine(self.settings.DATABASE_URL, pgbouncer=self.settings.PGBOUNCER)
+                
+                # 执行健康检查
+                is_healthy = await db.health_check()
             
             if is_healthy:
                 self.record_check(
@@ -167,7 +264,8 @@ class HealthChecker:
     async def check_network_connectivity_async(self):
         """检查网络连接"""
         try:
-            is_connected = await check_network_connectivity(timeout=10.0)
+            network = load_project_module("utils.network")
+            is_connected = await network.check_network_connectivity(timeout=10.0, session=self.session())
             
             if is_connected:
                 self.record_check(
@@ -194,38 +292,31 @@ class HealthChecker:
     
     async def check_telegram_api(self):
         """检查Telegram API连接"""
+        telegram_api = load_project_module("utils.telegram_api")
         try:
-            url = f"https://api.telegram.org/bot{self.settings.BOT_TOKEN}/getMe"
+            bot_info = await telegram_api.get_me(self.settings.BOT_TOKEN, session=self.session())
+            details = {
+                "bot_username": bot_info.get("username"),
+                "bot_name": bot_info.get("first_name"),
+                "can_join_groups": bot_info.get("can_join_groups"),
+                "can_read_all_group_messages": bot_info.get("can_read_all_group_messages")
+            }
             
-            timeout = aiohttp.ClientTimeout(total=10.0)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get("ok"):
-                            bot_info = data.get("result", {})
-                            details = {
-                                "bot_username": bot_info.get("username"),
-                                "bot_name": bot_info.get("first_name"),
-                                "can_join_groups": bot_info.get("can_join_groups"),
-                                "can_read_all_group_messages": bot_info.get("can_read_all_group_messages")
-                            }
-                            
-                            self.record_check(
-                                "Telegram API",
-                                True,
-                                "Telegram API连接正常",
-                                details
-                            )
-                            return True
-                    
-                    self.record_check(
-                        "Telegram API",
-                        False,
-                        f"Telegram API响应异常: HTTP {response.status}"
-                    )
-                    return False
-                    
+            self.record_check(
+                "Telegram API",
+                True,
+                "Telegram API连接正常",
+                details
+            )
+            return True
+
+        except telegram_api.TelegramApiError as e:
+            self.record_check(
+                "Telegram API",
+                False,
+                f"Telegram API响应异常: HTTP {e.status}"
+            )
+            return False
         except Exception as e:
             self.record_check(
                 "Telegram API",
@@ -234,7 +325,7 @@ class HealthChecker:
             )
             return False
     
-    def check_file_permissions(self):
+    async def check_file_permissions(self):
         """检查文件权限"""
         paths_to_check = [
             ("./data", "数据目录"),
@@ -242,17 +333,11 @@ class HealthChecker:
             ("./logs", "日志目录"),
         ]
         
-        issues = []
-        
-        for path, description in paths_to_check:
-            if os.path.exists(path):
-                if not os.access(path, os.R_OK | os.W_OK):
-                    issues.append(f"{description}权限不足")
-            else:
-                try:
-                    os.makedirs(path, exist_ok=True)
-                except Exception as e:
-                    issues.append(f"无法创建{description}: {str(e)}")
+        # 各目录的检查/创建互不依赖，放到线程池并发执行，重叠慢文件系统上的系统调用延迟
+        results = await asyncio.gather(
+            *(asyncio.to_thread(_check_directory, path, description) for path, description in paths_to_check)
+        )
+        issues = [issue for issue in results if issue]
         
         if issues:
             self.record_check(
@@ -272,9 +357,6 @@ class HealthChecker:
     
     def get_system_info(self):
         """获取系统信息"""
-        import platform
-        import psutil
-        
         try:
             memory = psutil.virtual_memory()
             disk = psutil.disk_usage('.')
@@ -311,10 +393,17 @@ class HealthChecker:
         """运行所有健康检查"""
         print("🔍 开始综合健康检查...\n")
         
+        # SQLite 的连接检查会以读写方式打开数据库文件，文件检查只需确认存在
+        db_file_mode = (
+            ValidationMode.SKIP
+            if sqlite_path_from_url(self.settings.DATABASE_URL) is not None
+            else ValidationMode.FULL
+        )
+        
         checks = [
             ("环境变量检查", self.check_environment, False),
-            ("文件权限检查", self.check_file_permissions, False),
-            ("数据库文件检查", self.check_database_file, False),
+            ("文件权限检查", self.check_file_permissions, True),
+            ("数据库文件检查", lambda: self.check_database_file(db_file_mode), False),
             ("数据库连接检查", self.check_database_connection, True),
             ("网络连接检查", self.check_network_connectivity_async, True),
             ("Telegram API检查", self.check_telegram_api, True),
@@ -323,30 +412,41 @@ class HealthChecker:
         
         passed_count = 0
         total_count = len(checks)
-        
+
+        # 同步检查依次执行
         for name, check_func, is_async in checks:
+            if is_async:
+                continue
             print(f"\n📋 {name}:")
             try:
-                if is_async:
-                    result = await check_func()
-                else:
-                    result = check_func()
-                    
-                if result:
+                if check_func():
                     passed_count += 1
-                    
             except Exception as e:
                 print(f"❌ {name}执行失败: {str(e)}")
-        
-        print("\n" + "="*60)
-        print(f"📊 健康检查结果: {passed_count}/{total_count} 通过")
-        
-        if passed_count == total_count:
-            print("✅ 所有健康检查通过，系统状态良好")
-            return True
-        else:
-            print(f"❌ {total_count - passed_count} 项检查失败，需要注意")
-            return False
+
+        # 异步检查彼此独立（均为 IO 等待），并发执行，总耗时取最慢的一项
+        async_checks = [(name, check_func) for name, check_func, is_async in checks if is_async]
+        print(f"\n📋 {' / '.join(name for name, _ in async_checks)}（并发执行）:")
+        results = await asyncio.gather(
+            *(check_func() for _, check_func in async_checks),
+            return_exceptions=True
+        )
+        for (name, _), result in zip(async_checks, results):
+            if isinstance(result, BaseException):
+                print(f"❌ {name}执行失败: {str(result)}")
+            elif result:
+                passed_count += 1
+
+        all_passed = passed_count == total_count
+        summary = [
+            "\n" + "=" * 60 + "\n",
+            f"📊 健康检查结果: {passed_count}/{total_count} 通过\n",
+            "✅ 所有健康检查通过，系统状态良好\n" if all_passed
+            else f"❌ {total_count - passed_count} 项检查失败，需要注意\n",
+        ]
+        sys.stdout.write("".join(summary))
+        sys.stdout.flush()
+        return all_passed
     
     def get_summary(self):
         """获取检查摘要"""
@@ -357,8 +457,29 @@ class HealthChecker:
             "results": self.results
         }
 
+def dumps_summary(summary: Dict[str, Any]) -> str:
+    """序列化检查摘要；安装了 orjson 时优先使用，否则回退到标准库 json"""
+    try:
+        import orjson
+    except ImportError:
+        import json
+        return json.dumps(summary, ensure_ascii=False, separators=(",", ":"))
+    return orjson.dumps(summary).decode()
+
+
 async def main():
     """主健康检查函数"""
+    if os.environ.get("HEALTHCHECK_JSON"):
+        # 机器可读模式：逐项结果、汇总等人类可读输出改写到 stderr，stdout 只有最后一行 JSON
+        json_out = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            await _run_checks(json_out)
+    else:
+        await _run_checks(None)
+
+
+async def _run_checks(json_out: Optional[TextIO]) -> None:
+    """执行全部检查并输出摘要；json_out 不为 None 时把完整摘要作为一行 JSON 写入其中"""
     checker = HealthChecker()
     
     try:
@@ -366,6 +487,12 @@ async def main():
         
         # 输出详细摘要
         summary = checker.get_summary()
+        if json_out is not None:
+            # 完整摘要输出为一行 JSON，退出码不变
+            json_out.write(dumps_summary(summary) + "\n")
+            json_out.flush()
+            sys.exit(0 if success else 1)
+        
         print(f"\n📈 检查摘要:")
         print(f"   总检查项: {summary['total_checks']}")
         print(f"   通过: {summary['passed_checks']}")
@@ -384,13 +511,20 @@ async def main():
     except Exception as e:
         print(f"\n💥 健康检查执行异常: {str(e)}")
         sys.exit(1)
+    finally:
+        await checker.aclose()
 
 if __name__ == "__main__":
     # 安装必要的依赖检查
-    try:
-        import psutil
-    except ImportError:
+    if psutil is None:
         print("❌ 缺少psutil依赖，请运行: pip install psutil")
         sys.exit(1)
     
+    # 可选：安装了 uvloop 时使用其事件循环（Windows 上不可用，忽略即可）
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     asyncio.run(main())
\ No newline at end of file
@@ -9,42 +9,76 @@ import asyncio
 import json
 import logging
 import os
+import re
 import sys
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 
+import aiofiles
+import psutil
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).parent))
 
 try:
     from orderbot.src.utils.process_monitor import ProcessMonitor, MonitorConfig, ProcessState
     from orderbot.src.utils.network import NetworkHealthChecker, check_network_connectivity
-    from orderbot.src.core.database import health_check as db_health_check
-    from orderbot.src.core.settings import Settings
+    from orderbot.src.core.db import init_engine, close_engine, health_check as db_health_check
+    from orderbot.src.config import get_settings
 except ImportError as e:
     print(f"导入模块失败: {e}")
     print("请确保在项目根目录运行此脚本")
     sys.exit(1)
 
+# 日志目录只在导入时创建一次（FileHandler 需要它已存在）
+LOG_DIR = Path('logs')
+LOG_DIR.mkdir(exist_ok=True)
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('logs/monitor.log'),
+        logging.FileHandler(LOG_DIR / 'monitor.log'),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
+# 告警去重时忽略其中的数值（如 "CPU使用率过高: 93.1%"），同类告警共用一个冷却计时
+_ALERT_NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(obj: Any, indent: bool = False) -> bytes:
+    """序列化为 UTF-8 JSON 字节；优先使用 orjson，datetime 输出为 ISO 格式"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(
+        obj, ensure_ascii=False, indent=2 if indent else None, default=_json_default
+    ).encode('utf-8')
+
 
 class SystemMonitor:
     """系统监控器"""
     
+    # _perform_system_check 中各项检查的结果键，顺序与 gather 的参数一致
+    CHECK_NAMES = ('database', 'network', 'processes', 'resources', 'disk')
+    
     def __init__(self):
-        self.settings = Settings()
+        self.settings = get_settings()
         self.process_monitor = ProcessMonitor(
             MonitorConfig(
                 check_interval=30.0,
@@ -53,11 +87,29 @@ class SystemMonitor:
                 cpu_threshold=80.0,
                 memory_threshold=70.0,
                 enable_auto_restart=True,
-                log_file='logs/process_monitor.log'
+                log_file=str(LOG_DIR / 'process_monitor.log')
             )
         )
         self.network_checker = NetworkHealthChecker(check_interval=60.0)
+        # CPU 核数运行期间不变，只取一次
+        self._cpu_count = psutil.cpu_count() or 1
+        # 先调用一次作为基准，之后 cpu_percent(interval=None) 返回两次调用之间的使用率，不再阻塞
+        psutil.cpu_percent(interval=None)
         self.is_running = False
+        # 告警去重：同类告警在冷却期内只记录一次
+        self._alert_cache: Dict[str, float] = {}
+        self._alert_cooldown = 60.0
+        # 告警时间戳按秒缓存：同一秒内的多条告警复用同一个格式化结果
+        self._ts_second = -1
+        self._ts_text = ''
+        self._alert_path = LOG_DIR / 'alerts.log'
+        self._results_path = LOG_DIR / 'check_results.jsonl'
+        self._bot_log_path = LOG_DIR / 'bot.log'
+        # 告警/检查结果文件在 start() 中打开一次；检查结果按条数批量 flush
+        self._alerts_fp = None
+        self._results_fp = None
+        self._results_pending = 0
+        self._results_flush_every = 10
         self.start_time = datetime.now()
         self.stats = {
             'total_checks': 0,
@@ -79,6 +131,9 @@ class SystemMonitor:
         self.is_running = True
         
         try:
+            # 数据库检查复用 core.db 的引擎，需先初始化
+            await init_engine(self.settings.DATABASE_URL, pgbouncer=self.settings.PGBOUNCER)
+            
             # 注册机器人进程
             bot_command = [sys.executable, "app.py"]
             self.process_monitor.register_process(
@@ -87,6 +142,9 @@ class SystemMonitor:
                 self._bot_health_check
             )
             
+            self._alerts_fp = await aiofiles.open(self._alert_path, 'ab')
+            self._results_fp = await aiofiles.open(self._results_path, 'ab', buffering=8192)
+            
             # 启动各个监控组件
             await self.process_monitor.start_monitoring()
             await self.network_checker.start()
@@ -100,7 +158,7 @@ class SystemMonitor:
             await self._monitor_loop()
             
         except Exception as e:
-            logger.error(f"启动系统监控失败: {e}")
+            logger.error("启动系统监控失败: %s", e)
             await self.stop()
             raise
     
@@ -116,6 +174,16 @@ class SystemMonitor:
             # 停止监控组件
             await self.process_monitor.stop_monitoring()
             await self.network_checker.stop()
+            await close_engine()
+            
+            # 写出剩余的检查结果并关闭文件
+            if self._alerts_fp is not None:
+                await self._alerts_fp.close()
+                self._alerts_fp = None
+            if self._results_fp is not None:
+                await self._results_fp.close()
+                self._results_fp = None
+                self._results_pending = 0
             
             # 生成监控报告
             await self._generate_report()
@@ -123,7 +191,7 @@ class SystemMonitor:
             logger.info("系统监控已停止")
             
         except Exception as e:
-            logger.error(f"停止系统监控时发生错误: {e}")
+            logger.error("停止系统监控时发生错误: %s", e)
     
     async def _monitor_loop(self) -> None:
         """主监控循环"""
@@ -134,46 +202,39 @@ class SystemMonitor:
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"监控循环异常: {e}")
+                logger.error("监控循环异常: %s", e)
                 await asyncio.sleep(60)
     
     async def _perform_system_check(self) -> None:
         """执行系统检查"""
         self.stats['total_checks'] += 1
-        check_results = {}
         
         try:
-            # 检查数据库连接
-            db_healthy = await self._check_database()
-            check_results['database'] = db_healthy
-            
-            # 检查网络连接
-            network_healthy = await self._check_network()
-            check_results['network'] = network_healthy
-            
-            # 检查进程状态
-            process_healthy = await self._check_processes()
-            check_results['processes'] = process_healthy
-            
-            # 检查系统资源
-            resource_healthy = await self._check_system_resources()
-            check_results['resources'] = resource_healthy
-            
-            # 检查磁盘空间
-            disk_healthy = await self._check_disk_space()
-            check_results['disk'] = disk_healthy
+            # 各项检查互不依赖，并发执行：总耗时取决于最慢的一项
+            results = await asyncio.gather(
+                self._check_database(),
+                self._check_network(),
+                self._check_processes(),
+                self._check_system_resources(),
+                self._check_disk_space(),
+                return_exceptions=True
+            )
+            check_results = {
+                name: not isinstance(result, BaseException) and bool(result)
+                for name, result in zip(self.CHECK_NAMES, results)
+            }
             
             # 统计检查结果
             failed_checks = sum(1 for result in check_results.values() if not result)
             if failed_checks > 0:
                 self.stats['failed_checks'] += 1
-                logger.warning(f"系统检查发现 {failed_checks} 个问题")
+                logger.warning("系统检查发现 %s 个问题", failed_checks)
             
             # 记录检查结果
             await self._log_check_results(check_results)
             
         except Exception as e:
-            logger.error(f"系统检查异常: {e}")
+            logger.error("系统检查异常: %s", e)
             self.stats['failed_checks'] += 1
     
     async def _check_database(self) -> bool:
@@ -184,19 +245,20 @@ class SystemMonitor:
                 await self._handle_alert("数据库连接检查失败")
             return result
         except Exception as e:
-            logger.error(f"数据库检查异常: {e}")
+            logger.error("数据库检查异常: %s", e)
             await self._handle_alert(f"数据库检查异常: {e}")
             return False
     
     async def _check_network(self) -> bool:
         """检查网络连接"""
         try:
-            network_status = self.network_checker.get_status()
-            if not network_status['is_healthy']:
+            # 后台检查任务会持续更新 is_healthy，这里直接读取，不构造状态字典
+            is_healthy = self.network_checker.is_healthy
+            if not is_healthy:
                 await self._handle_alert("网络连接异常")
-            return network_status['is_healthy']
+            return is_healthy
         except Exception as e:
-            logger.error(f"网络检查异常: {e}")
+            logger.error("网络检查异常: %s", e)
             return False
     
     async def _check_processes(self) -> bool:
@@ -212,47 +274,52 @@ class SystemMonitor:
             
             return healthy
         except Exception as e:
-            logger.error(f"进程检查异常: {e}")
+            logger.error("进程检查异常: %s", e)
             return False
     
     async def _check_system_resources(self) -> bool:
         """检查系统资源"""
         try:
-            import psutil
+            # psutil 读取 /proc 放到线程池执行
+            cpu_percent, memory_percent, load_avg = await asyncio.to_thread(
+                self._read_system_resources
+            )
             
             # CPU使用率
-            cpu_percent = psutil.cpu_percent(interval=1)
             if cpu_percent > 90:
                 await self._handle_alert(f"系统CPU使用率过高: {cpu_percent:.1f}%")
                 return False
             
             # 内存使用率
-            memory = psutil.virtual_memory()
-            if memory.percent > 85:
-                await self._handle_alert(f"系统内存使用率过高: {memory.percent:.1f}%")
+            if memory_percent > 85:
+                await self._handle_alert(f"系统内存使用率过高: {memory_percent:.1f}%")
                 return False
             
             # 负载平均值（仅Linux/macOS）
-            if hasattr(os, 'getloadavg'):
-                load_avg = os.getloadavg()[0]
-                cpu_count = psutil.cpu_count()
-                if load_avg > cpu_count * 2:
+            if load_avg is not None:
+                if load_avg > self._cpu_count * 2:
                     await self._handle_alert(f"系统负载过高: {load_avg:.2f}")
                     return False
             
             return True
             
         except Exception as e:
-            logger.error(f"系统资源检查异常: {e}")
+            logger.error("系统资源检查异常: %s", e)
             return False
     
+    @staticmethod
+    def _read_system_resources():
+        """读取 CPU、内存使用率与 1 分钟负载（不支持 getloadavg 的平台负载为 None）"""
+        cpu_percent = psutil.cpu_percent(interval=None)
+        memory_percent = psutil.virtual_memory().percent
+        load_avg = os.getloadavg()[0] if hasattr(os, 'getloadavg') else None
+        return cpu_percent, memory_percent, load_avg
+    
     async def _check_disk_space(self) -> bool:
         """检查磁盘空间"""
         try:
-            import psutil
-            
             # 检查当前目录所在磁盘
-            disk_usage = psutil.disk_usage('.')
+            disk_usage = await asyncio.to_thread(psutil.disk_usage, '.')
             free_percent = (disk_usage.free / disk_usage.total) * 100
             
             if free_percent < 10:  # 剩余空间少于10%
@@ -265,14 +332,14 @@ class SystemMonitor:
             return True
             
         except Exception as e:
-            logger.error(f"磁盘空间检查异常: {e}")
+            logger.error("磁盘空间检查异常: %s", e)
             return False
     
     async def _bot_health_check(self) -> bool:
         """机器人健康检查"""
         try:
             # 检查日志文件是否有最近的活动
-            log_file = Path('logs/bot.log')
+            log_file = self._bot_log_path
             if log_file.exists():
                 # 检查最近5分钟内是否有日志更新
                 last_modified = datetime.fromtimestamp(log_file.stat().st_mtime)
@@ -286,28 +353,50 @@ class SystemMonitor:
             return True
             
         except Exception as e:
-            logger.error(f"机器人健康检查异常: {e}")
+            logger.error("机器人健康检查异常: %s", e)
             return False
     
     async def _handle_alert(self, message: str) -> None:
         """处理告警"""
+        key = _ALERT_NUMBER_RE.sub('#', message)
+        now = time.monotonic()
+        last_sent = self._alert_cache.get(key)
+        if last_sent is not None and now - last_sent < self._alert_cooldown:
+            return
+        self._alert_cache[key] = now
+        
         self.stats['alerts_sent'] += 1
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = self._format_timestamp()
         alert_message = f"[{timestamp}] 系统告警: {message}"
         
         # 记录到日志
         logger.warning(alert_message)
         
-        # 写入告警文件
-        alert_file = Path('logs/alerts.log')
-        alert_file.parent.mkdir(exist_ok=True)
-        
-        with open(alert_file, 'a', encoding='utf-8') as f:
-            f.write(f"{alert_message}\n")
+        # 写入告警文件（aiofiles 在线程池中执行，不阻塞事件循环）；告警较少，每条都立即 flush
+        line = f"{alert_message}\n".encode('utf-8')
+        if self._alerts_fp is None:
+            await self._append_line(self._alert_path, line)
+        else:
+            await self._alerts_fp.write(line)
+            await self._alerts_fp.flush()
         
         # 这里可以添加其他告警方式，如发送邮件、Webhook等
         # await self._send_webhook_alert(alert_message)
     
+    def _format_timestamp(self) -> str:
+        """返回当前时间 '%Y-%m-%d %H:%M:%S'，同一秒内不重复格式化"""
+        now = int(time.time())
+        if now != self._ts_second:
+            self._ts_second = now
+            self._ts_text = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+        return self._ts_text
+    
+    @staticmethod
+    async def _append_line(path: Path, line: bytes) -> None:
+        """追加一行到文件（未调用 start() 时使用）"""
+        async with aiofiles.open(path, 'ab') as f:
+            await f.write(line)
+    
     async def _log_check_results(self, results: Dict[str, bool]) -> None:
         """记录检查结果"""
         log_entry = {
@@ -316,12 +405,18 @@ class SystemMonitor:
             'stats': self.stats.copy()
         }
         
+        line = dumps_json(log_entry) + b'\n'
+        
         # 写入检查结果文件
-        results_file = Path('logs/check_results.jsonl')
-        results_file.parent.mkdir(exist_ok=True)
+        if self._results_fp is None:
+            await self._append_line(self._results_path, line)
+            return
         
-        with open(results_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
+        await self._results_fp.write(line)
+        self._results_pending += 1
+        if self._results_pending >= self._results_flush_every:
+            await self._results_fp.flush()
+            self._results_pending = 0
     
     async def _generate_report(self) -> None:
         """生成监控报告"""
@@ -329,8 +424,8 @@ class SystemMonitor:
         
         report = {
             'monitoring_period': {
-                'start_time': self.start_time.isoformat(),
-                'end_time': datetime.now().isoformat(),
+                'start_time': self.start_time,
+                'end_time': datetime.now(),
                 'uptime_seconds': uptime.total_seconds(),
                 'uptime_formatted': str(uptime)
             },
@@ -340,13 +435,12 @@ class SystemMonitor:
         }
         
         # 保存报告
-        report_file = Path(f'logs/monitor_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
-        report_file.parent.mkdir(exist_ok=True)
+        report_file = LOG_DIR / f'monitor_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
         
-        with open(report_file, 'w', encoding='utf-8') as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
+        async with aiofiles.open(report_file, 'wb') as f:
+            await f.write(dumps_json(report, indent=True))
         
-        logger.info(f"监控报告已保存: {report_file}")
+        logger.info("监控报告已保存: %s", report_file)
     
     def get_status(self) -> Dict[str, Any]:
         """获取监控状态"""
@@ -365,30 +459,39 @@ async def main():
     """主函数"""
     import signal
     
-    # 创建日志目录
-    Path('logs').mkdir(exist_ok=True)
-    
     monitor = SystemMonitor()
     
-    # 设置信号处理
-    def signal_handler(signum, frame):
-        logger.info(f"收到信号 {signum}，准备停止监控...")
+    # 设置信号处理：通过事件循环注册，回调在循环线程内调度 stop()
+    def signal_handler(signum):
+        logger.info("收到信号 %s，准备停止监控...", signum)
         asyncio.create_task(monitor.stop())
     
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, signal_handler, sig)
+        except NotImplementedError:
+            # Windows 的事件循环不支持 add_signal_handler
+            signal.signal(sig, lambda signum, frame: loop.call_soon_threadsafe(signal_handler, signum))
     
     try:
         await monitor.start()
     except KeyboardInterrupt:
         logger.info("收到中断信号，停止监控...")
     except Exception as e:
-        logger.error(f"监控运行异常: {e}")
+        logger.error("监控运行异常: %s", e)
     finally:
         await monitor.stop()
 
 
 if __name__ == '__main__':
+    # 有 uvloop 时换用 libuv 事件循环，降低监控循环的调度开销
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -2,10 +2,11 @@ from __future__ import annotations
 
 import asyncio
 
-from .src.app import main
+from .src.app import install_event_loop_policy, main
 
 
 if __name__ == "__main__":
+    install_event_loop_policy()
     asyncio.run(main())
 
 
@@ -4,11 +4,13 @@ import os
 import signal
 import sys
 from typing import Optional
-from aiogram import Bot, Dispatcher
+import ssl
+import certifi
+from aiogram import Bot, Dispatcher, __version__ as aiogram_version
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 from aiogram.client.session.aiohttp import AiohttpSession
-from aiohttp import ClientTimeout
+from aiohttp import AsyncResolver, ClientSession, TCPConnector
 
 # 尝试加载 .env 文件
 try:
@@ -18,7 +20,9 @@ except ImportError:
     # 如果没有安装 python-dotenv，跳过
     pass
 
-from .config import Settings
+from .config import Settings, get_settings
+from .services.channel_publisher import close_bot as close_channel_bot
+from .services.order_service import drain_background_publishes
 from .tg.bot import setup_bot, shutdown_bot
 from .utils.logging import log_info, log_error
 from .utils.process_monitor import setup_bot_monitoring, shutdown_monitoring, MonitorConfig
@@ -33,14 +37,73 @@ def signal_handler(signum, frame):
     log_info("signal.received", signal=signum)
     shutdown_event.set()
 
+def install_signal_handlers() -> None:
+    """在运行中的事件循环上注册 SIGINT/SIGTERM，回调在循环线程内执行"""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, signal_handler, sig, None)
+        except NotImplementedError:
+            # Windows 的事件循环不支持 add_signal_handler，退回 signal.signal
+            signal.signal(sig, signal_handler)
+
+async def _wait_for_shutdown(delay: float) -> bool:
+    """最多等待 delay 秒，期间收到关闭信号返回 True，超时返回 False（不抛 TimeoutError）"""
+    if shutdown_event.is_set():
+        return True
+    try:
+        async with asyncio.timeout(delay):
+            await shutdown_event.wait()
+    except TimeoutError:
+        return False
+    return True
+
+class TelegramSession(AiohttpSession):
+    """自行构建 aiohttp 连接器的 AiohttpSession（AiohttpSession 没有公开连接器参数）
+
+    所有请求都发往同一个 Telegram 主机：空闲连接保持 KEEPALIVE_TIMEOUT 秒，让后续长轮询直接复用；
+    安装了 aiodns 时用异步 DNS 解析，避免 getaddrinfo 占用线程池。
+    """
+
+    KEEPALIVE_TIMEOUT = 75
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._client: Optional[ClientSession] = None
+
+    def build_connector(self) -> TCPConnector:
+        connector_kwargs = {
+            "ssl": ssl.create_default_context(cafile=certifi.where()),
+            "limit": 100,
+            "ttl_dns_cache": 3600,
+            "keepalive_timeout": self.KEEPALIVE_TIMEOUT,
+        }
+        try:
+            import aiodns  # noqa: F401
+        except ImportError:
+            pass
+        else:
+            connector_kwargs["resolver"] = AsyncResolver()
+        return TCPConnector(**connector_kwargs)
+
+    async def create_session(self) -> ClientSession:
+        if self._client is None or self._client.closed:
+            self._client = ClientSession(
+                connector=self.build_connector(),
+                headers={"User-Agent": f"aiogram/{aiogram_version}"},
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None and not self._client.closed:
+            await self._client.close()
+        await super().close()
+
+
 async def create_bot(settings: Settings) -> Bot:
-    """创建Bot实例，配置网络超时和重试"""
-    # 使用简化的超时配置
-    timeout = ClientTimeout(total=30)
-    
-    session = AiohttpSession(
-        timeout=timeout
-    )
+    """创建Bot实例，配置网络超时和连接复用"""
+    # 普通请求 30 秒超时；getUpdates 长轮询时 aiogram 会在此基础上再加上 polling timeout
+    session = TelegramSession(timeout=30)
     
     bot = Bot(
         token=settings.BOT_TOKEN,
@@ -93,11 +156,8 @@ async def run_bot_with_restart(settings: Settings):
                 break
             
             log_info("bot.retry_delay", delay=delay)
-            try:
-                await asyncio.wait_for(shutdown_event.wait(), timeout=delay)
+            if await _wait_for_shutdown(delay):
                 break  # 如果在等待期间收到关闭信号，则退出
-            except asyncio.TimeoutError:
-                continue  # 超时后继续重试
         finally:
             # 清理资源
             if dp_instance:
@@ -115,7 +175,7 @@ async def run_bot_with_restart(settings: Settings):
 
 async def main() -> None:
     """Application entrypoint: start long polling bot."""
-    settings = Settings()  # loads from env
+    settings = get_settings()  # loads from env (cached for the process)
 
     # Configure basic logging early (console only for now)
     logging.basicConfig(
@@ -138,8 +198,7 @@ async def main() -> None:
     log_info("process.monitor.initialized")
     
     # 注册信号处理器
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    install_signal_handlers()
     
     try:
         await run_bot_with_restart(settings)
@@ -168,9 +227,25 @@ async def main() -> None:
                 await bot_instance.session.close()
             except Exception as e:
                 log_error("bot.final_cleanup_error", error=str(e))
+        try:
+            # 频道 Bot 关闭前等待仍在进行的后台发布
+            await drain_background_publishes()
+            await close_channel_bot()
+        except Exception as e:
+            log_error("channel_publisher.close_error", error=str(e))
+
+
+def install_event_loop_policy() -> None:
+    """安装 uvloop 事件循环策略（未安装或不支持的平台上保持默认循环）"""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    uvloop.install()
 
 
 if __name__ == "__main__":
+    install_event_loop_policy()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -1,10 +1,26 @@
 from __future__ import annotations
 
-from typing import Optional, Set
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from typing import Any, FrozenSet, Iterable, Optional
+from pydantic import BaseModel, Field, PrivateAttr
 import os
 
 
+@lru_cache(maxsize=16)
+def _parse_user_ids(raw: str) -> FrozenSet[int]:
+    ids = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            ids.add(int(part))
+        except ValueError:
+            # ignore invalid piece silently; middlewares will treat as not whitelisted
+            continue
+    return frozenset(ids)
+
+
 class Settings(BaseModel):
     """Application settings loaded from environment variables.
 
@@ -19,27 +35,30 @@ class Settings(BaseModel):
     ALLOWED_USER_IDS: str = Field(default_factory=lambda: os.environ.get("ALLOWED_USER_IDS", ""))
 
     DATABASE_URL: str = Field(default_factory=lambda: os.environ.get("DATABASE_URL", "sqlite+aiosqlite:///./orderbot.db"))
+    # 数据库前置 pgbouncer（事务池模式）时设为 1/true：关闭 asyncpg 预编译语句缓存
+    PGBOUNCER: bool = Field(default_factory=lambda: os.environ.get("PGBOUNCER", "").strip().lower() in ("1", "true", "yes"))
     LOG_LEVEL: str = Field(default_factory=lambda: os.environ.get("LOG_LEVEL", "INFO"))
 
-    def allowed_user_ids(self) -> Set[int]:
-        """Parse ALLOWED_USER_IDS env to a set of ints.
+    # ALLOWED_USER_IDS 解析后的集合：构造时算好，每次鉴权只做一次集合查找
+    _allowed_user_ids: FrozenSet[int] = PrivateAttr(default=frozenset())
+
+    def model_post_init(self, __context: Any) -> None:
+        self._allowed_user_ids = _parse_user_ids(self.ALLOWED_USER_IDS or "")
+
+    def allowed_user_ids(self) -> FrozenSet[int]:
+        """Return ALLOWED_USER_IDS as a frozenset of ints, parsed once when Settings is built.
 
         Empty means no explicit whitelist; handlers/middleware will fallback to channel-membership checks as documented.
+        Use `set_allowed_user_ids` to change the whitelist so the parsed set stays in sync.
         """
-        raw = (self.ALLOWED_USER_IDS or "").strip()
-        ids: Set[int] = set()
-        if not raw:
-            return ids
-        for part in raw.split(","):
-            part = part.strip()
-            if not part:
-                continue
-            try:
-                ids.add(int(part))
-            except ValueError:
-                # ignore invalid piece silently; middlewares will treat as not whitelisted
-                continue
-        return ids
+        return self._allowed_user_ids
+
+    def set_allowed_user_ids(self, user_ids: Iterable[int]) -> str:
+        """Replace the whitelist in place; returns the new ALLOWED_USER_IDS string (sorted, comma separated)."""
+        ids = frozenset(user_ids)
+        self.ALLOWED_USER_IDS = ",".join(str(uid) for uid in sorted(ids))
+        self._allowed_user_ids = ids
+        return self.ALLOWED_USER_IDS
 
     def channel_id_int(self) -> int:
         return int(self.CHANNEL_ID)
@@ -60,3 +79,12 @@ class Settings(BaseModel):
             return None
         username = self.BOT_USERNAME.lstrip("@")
         return f"https://t.me/{username}?start=apply_{order_id}"
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return a process-wide Settings instance, built on first use.
+
+    Environment changes after the first call are not picked up; construct `Settings()` directly when a fresh read is needed.
+    """
+    return Settings()
@@ -6,7 +6,7 @@ from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine, AsyncEngine
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.pool import StaticPool
-from sqlalchemy import event
+from sqlalchemy import Enum as SAEnum, event, inspect
 
 from ..utils.logging import log_info, log_error
 
@@ -20,28 +20,86 @@ _Session: Optional[async_sessionmaker[AsyncSession]] = None
 _db_lock = asyncio.Lock()
 
 
+# 每个新 SQLite 连接执行的 PRAGMA，导入时拼成一条脚本，连接时一次 executescript 下发
+_SQLITE_PRAGMAS = (
+    # 页大小只对尚未建表的新库生效，必须在切换 WAL 之前设置
+    "page_size=8192",
+    # 启用WAL模式以提高并发性能
+    "journal_mode=WAL",
+    # 设置同步模式为NORMAL以平衡性能和安全性
+    "synchronous=NORMAL",
+    # 设置缓存大小（以页为单位）
+    "cache_size=10000",
+    # 设置临时存储为内存
+    "temp_store=MEMORY",
+    # 启用外键约束
+    "foreign_keys=ON",
+    # 设置忙等待超时（毫秒）
+    "busy_timeout=30000",
+    # 读取走内存映射（最多 256MB），减少 read 系统调用与缓冲拷贝
+    "mmap_size=268435456",
+    # WAL 累积 10000 页再自动 checkpoint，减少写入时的 checkpoint 停顿
+    "wal_autocheckpoint=10000",
+    # 允许排序/建索引使用辅助线程
+    "threads=4",
+)
+_SQLITE_PRAGMA_SCRIPT = "".join(f"PRAGMA {pragma};" for pragma in _SQLITE_PRAGMAS)
+
+
 def _configure_sqlite_pragmas(dbapi_connection, connection_record):
     """配置SQLite性能优化参数"""
-    cursor = dbapi_connection.cursor()
-    try:
-        # 启用WAL模式以提高并发性能
-        cursor.execute("PRAGMA journal_mode=WAL")
-        # 设置同步模式为NORMAL以平衡性能和安全性
-        cursor.execute("PRAGMA synchronous=NORMAL")
-        # 设置缓存大小（以页为单位，每页通常4KB）
-        cursor.execute("PRAGMA cache_size=10000")
-        # 设置临时存储为内存
-        cursor.execute("PRAGMA temp_store=MEMORY")
-        # 启用外键约束
-        cursor.execute("PRAGMA foreign_keys=ON")
-        # 设置忙等待超时（毫秒）
-        cursor.execute("PRAGMA busy_timeout=30000")
-    finally:
-        cursor.close()
+    run_async = getattr(dbapi_connection, "run_async", None)
+    if run_async is not None:
+        # aiosqlite 适配连接：在底层驱动连接上执行脚本
+        run_async(lambda conn: conn.executescript(_SQLITE_PRAGMA_SCRIPT))
+    else:
+        dbapi_connection.executescript(_SQLITE_PRAGMA_SCRIPT)
+
+
+# 已被 (created_by, updated_at) / (claimed_by, updated_at) 复合索引取代的单列索引
+_SUPERSEDED_INDEXES = ("ix_orders_created_by", "ix_orders_claimed_by")
+
+
+def _upgrade_schema(connection) -> None:
+    """Bring tables created by an older version in line with the models.
+
+    create_all only creates missing tables: indexes added later are never created on an existing
+    table, and Postgres ENUM columns are never converted. Every step is idempotent.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    for name in _SUPERSEDED_INDEXES:
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    if connection.dialect.name == "postgresql":
+        _convert_native_enums(connection)
+
+
+def _convert_native_enums(connection) -> None:
+    """原生 ENUM 列改为与模型一致的 VARCHAR（值仍是枚举名），随后删除不再使用的 ENUM 类型"""
+    inspector = inspect(connection)
+    enum_types: set[str] = set()
+    for table in Base.metadata.sorted_tables:
+        reflected = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            existing = reflected.get(column.name)
+            if isinstance(column.type, SAEnum) and isinstance(existing, SAEnum):
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ALTER COLUMN {column.name} "
+                    f"TYPE VARCHAR({column.type.length}) USING {column.name}::text"
+                )
+                enum_types.add(existing.name)
+    for name in enum_types:
+        connection.exec_driver_sql(f"DROP TYPE IF EXISTS {name}")
+
 
+async def init_engine(database_url: str, max_retries: int = 3, *, pgbouncer: bool = False) -> None:
+    """Initialize async engine, sessionmaker and create tables with retry mechanism.
 
-async def init_engine(database_url: str, max_retries: int = 3) -> None:
-    """Initialize async engine, sessionmaker and create tables with retry mechanism."""
+    `pgbouncer=True` disables asyncpg's prepared statement caches: in transaction pooling mode
+    consecutive statements may run on different server connections, where the cached statement
+    does not exist.
+    """
     global _engine, _Session
     
     async with _db_lock:
@@ -57,24 +115,39 @@ async def init_engine(database_url: str, max_retries: int = 3) -> None:
                     "echo": False,
                     "future": True,
                     "pool_pre_ping": True,  # 连接前检查连接是否有效
-                    "pool_recycle": 3600,   # 连接回收时间（秒）
-                    "connect_args": {
-                        "timeout": 30,  # 连接超时
-                        "check_same_thread": False,  # SQLite允许多线程
-                    }
                 }
                 
                 # 如果是SQLite，添加特殊配置
                 if database_url.startswith(("sqlite", "sqlite+aiosqlite")):
                     engine_kwargs.update({
                         "poolclass": StaticPool,
+                        "pool_recycle": 3600,   # 连接回收时间（秒）
+                        "connect_args": {
+                            "timeout": 30,  # 连接超时
+                            "check_same_thread": False,  # SQLite允许多线程
+                        },
                     })
                 else:
-                    # PostgreSQL或其他数据库的连接池配置
+                    # PostgreSQL或其他数据库的连接池配置（create_async_engine 默认使用 AsyncAdaptedQueuePool）
+                    connect_args = {"timeout": 30}  # 连接超时
+                    if database_url.startswith("postgresql+asyncpg"):
+                        # 服务端 TCP keepalive，尽早发现被中间设备断开的空闲连接
+                        connect_args["server_settings"] = {
+                            "tcp_keepalives_idle": "30",
+                            "tcp_keepalives_interval": "10",
+                            "tcp_keepalives_count": "3",
+                        }
+                        if pgbouncer:
+                            connect_args["statement_cache_size"] = 0
+                            connect_args["prepared_statement_cache_size"] = 0
+                            # 关闭 JIT，避免短查询在每个新连接上付出编译开销
+                            connect_args["server_settings"]["jit"] = "off"
                     engine_kwargs.update({
-                        "pool_size": 10,        # 连接池大小
+                        "pool_size": 20,        # 连接池大小
                         "max_overflow": 20,     # 最大溢出连接数
                         "pool_timeout": 30,     # 获取连接超时
+                        "pool_recycle": 1800,   # 早于常见的服务端/代理空闲超时回收连接
+                        "connect_args": connect_args,
                     })
                 
                 _engine = create_async_engine(database_url, **engine_kwargs)
@@ -89,9 +162,10 @@ async def init_engine(database_url: str, max_retries: int = 3) -> None:
                     class_=AsyncSession
                 )
                 
-                # 测试连接并创建表
+                # 测试连接并创建表；已存在的表补齐新增索引等变更
                 async with _engine.begin() as conn:
                     await conn.run_sync(Base.metadata.create_all)
+                    await conn.run_sync(_upgrade_schema)
                 
                 log_info("db.engine.initialized", database_url=database_url.split("://")[0] + "://***")
                 break
@@ -115,6 +189,10 @@ async def close_engine() -> None:
     async with _db_lock:
         if _engine is not None:
             try:
+                if _engine.dialect.name == "sqlite":
+                    # 关闭前让 SQLite 根据本次运行的查询情况更新统计信息
+                    async with _engine.connect() as conn:
+                        await conn.exec_driver_sql("PRAGMA optimize")
                 await _engine.dispose()
                 log_info("db.engine.closed")
             except Exception as e:
@@ -126,42 +204,51 @@ async def close_engine() -> None:
 
 @asynccontextmanager
 async def get_session():
-    """Get database session with automatic retry and error handling."""
+    """Get database session: commit on success, rollback and re-raise on error.
+
+    The body after `yield` runs only once, so retries (if needed) belong to the caller.
+    """
     if _Session is None:
         raise RuntimeError("DB engine not initialized. Call init_engine() first.")
     
-    max_retries = 3
-    retry_count = 0
-    
-    while retry_count < max_retries:
-        session = _Session()
-        try:
-            yield session
-            await session.commit()
-            break
-        except Exception as e:
-            await session.rollback()
-            retry_count += 1
-            
-            log_error("db.session.error", error=str(e), retry_count=retry_count, max_retries=max_retries)
-            
-            if retry_count >= max_retries:
-                raise
-            
-            # 短暂等待后重试
-            await asyncio.sleep(0.5 * retry_count)
-        finally:
-            await session.close()
+    session = _Session()
+    try:
+        yield session
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        log_error("db.session.error", error=str(e))
+        raise
+    finally:
+        await session.close()
+
+
+@asynccontextmanager
+async def get_readonly_session():
+    """Get database session for reads only: autoflush off and never committed.
+
+    The transaction is rolled back when the session closes, so nothing is written and SQLite's write lock is never requested.
+    """
+    if _Session is None:
+        raise RuntimeError("DB engine not initialized. Call init_engine() first.")
+
+    session = _Session(autoflush=False)
+    try:
+        yield session
+    finally:
+        await session.close()
 
 
 async def health_check() -> bool:
     """Check database connection health."""
+    if _engine is None:
+        log_error("db.health_check.failed", error="DB engine not initialized")
+        return False
     try:
-        async with get_session() as session:
-            # 执行简单查询测试连接
-            result = await session.execute("SELECT 1")
-            result.scalar()
-            return True
+        # 直接借用连接执行，不经过 ORM Session 与事务提交
+        async with _engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+        return True
     except Exception as e:
         log_error("db.health_check.failed", error=str(e))
         return False
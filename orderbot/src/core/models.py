@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime, UTC
 from enum import Enum
 from typing import Optional
-from sqlalchemy import String, Text, Integer, ForeignKey, Enum as SAEnum, DateTime
+from sqlalchemy import String, Text, Integer, ForeignKey, Enum as SAEnum, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .db import Base
@@ -14,6 +14,11 @@ def utc_now() -> datetime:
     return datetime.now(UTC)
 
 
+def _enum_column(enum_cls: type[Enum]) -> SAEnum:
+    """Enum stored as plain VARCHAR (no native Postgres ENUM type, whose ALTER TYPE locks the table)."""
+    return SAEnum(enum_cls, native_enum=False, create_constraint=False, length=16)
+
+
 class UserRole(str, Enum):
     admin = "admin"
     operator = "operator"
@@ -35,7 +40,7 @@ class User(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tg_user_id: Mapped[int] = mapped_column(Integer, unique=True, nullable=False, index=True)
     username: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
-    role: Mapped[str] = mapped_column(SAEnum(UserRole), default=UserRole.member, nullable=False)
+    role: Mapped[str] = mapped_column(_enum_column(UserRole), default=UserRole.member, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
 
     def __repr__(self) -> str:
@@ -44,18 +49,24 @@ class User(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    # "我的订单"按 created_by / claimed_by 过滤并按 updated_at 倒序取前 20 条，
+    # 复合索引让每个分支都是有序的索引范围扫描，无需额外排序；同时覆盖单列过滤
+    __table_args__ = (
+        Index("ix_orders_creator_updated", "created_by", "updated_at"),
+        Index("ix_orders_claimer_updated", "claimed_by", "updated_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String(120), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
     amount: Mapped[Optional[float]] = mapped_column(nullable=True)
     image_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)  # 图片文件路径
-    status: Mapped[str] = mapped_column(SAEnum(OrderStatus), default=OrderStatus.NEW, nullable=False, index=True)
+    status: Mapped[str] = mapped_column(_enum_column(OrderStatus), default=OrderStatus.NEW, nullable=False, index=True)
 
-    created_by: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    created_by: Mapped[int] = mapped_column(Integer, nullable=False)
     created_by_username: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     contact_username: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
-    claimed_by: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    claimed_by: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     claimed_by_username: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     channel_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
@@ -63,7 +74,10 @@ class Order(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, onupdate=utc_now, nullable=False)
 
-    histories: Mapped[list["OrderStatusHistory"]] = relationship(back_populates="order", cascade="all, delete-orphan")
+    # 禁止隐式懒加载（逐条订单查询历史即 N+1），需要时在查询中显式 selectinload
+    histories: Mapped[list["OrderStatusHistory"]] = relationship(
+        back_populates="order", cascade="all, delete-orphan", lazy="raise_on_sql"
+    )
 
 
 class OrderStatusHistory(Base):
@@ -71,8 +85,8 @@ class OrderStatusHistory(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), nullable=False, index=True)
-    from_status: Mapped[Optional[str]] = mapped_column(SAEnum(OrderStatus), nullable=True)
-    to_status: Mapped[str] = mapped_column(SAEnum(OrderStatus), nullable=False)
+    from_status: Mapped[Optional[str]] = mapped_column(_enum_column(OrderStatus), nullable=True)
+    to_status: Mapped[str] = mapped_column(_enum_column(OrderStatus), nullable=False)
     actor_user_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
     note: Mapped[Optional[str]] = mapped_column(String(400), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
@@ -93,6 +107,6 @@ class OrderApplication(Base):
     order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), nullable=False, index=True)
     applicant_tg_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
     applicant_username: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
-    status: Mapped[str] = mapped_column(SAEnum(ApplicationStatus), default=ApplicationStatus.PENDING, nullable=False, index=True)
+    status: Mapped[str] = mapped_column(_enum_column(ApplicationStatus), default=ApplicationStatus.PENDING, nullable=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now, onupdate=utc_now, nullable=False)
@@ -1,20 +1,40 @@
 from __future__ import annotations
 
-from typing import Optional, Sequence
-from sqlalchemy import select, update, and_
+from typing import AsyncIterator, Optional, Sequence
+from sqlalchemy import bindparam, select, update, and_, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from .models import Order, OrderStatus, OrderStatusHistory, OrderApplication, ApplicationStatus
 
 
+# Statements used on every request are built once; callers only bind parameters
+_ORDER_BY_ID = select(Order).where(Order.id == bindparam("order_id"))
+_ORDER_BY_ID_FOR_UPDATE = _ORDER_BY_ID.with_for_update()
+_APPLICATION_BY_ORDER_AND_APPLICANT = select(OrderApplication).where(
+    and_(OrderApplication.order_id == bindparam("order_id"), OrderApplication.applicant_tg_id == bindparam("applicant_tg_id"))
+)
+_APPLICATION_BY_ID = select(OrderApplication).where(OrderApplication.id == bindparam("app_id"))
+
+
 async def get_order_by_id(session: AsyncSession, order_id: int) -> Optional[Order]:
-    result = await session.execute(select(Order).where(Order.id == order_id))
-    return result.scalar_one_or_none()
+    """Load an order by primary key.
+
+    Uses the session identity map: an order already loaded (or refreshed by an UPDATE ... RETURNING)
+    in this session is returned without another SELECT, so claim -> edit -> re-read costs one query.
+    """
+    return await session.get(Order, order_id)
 
 
 async def get_order_by_id_for_update(session: AsyncSession, order_id: int) -> Optional[Order]:
-    # Placeholder for Postgres FOR UPDATE support in future
-    result = await session.execute(select(Order).where(Order.id == order_id))
+    """Load an order and lock its row until the transaction ends.
+
+    On Postgres this is SELECT ... FOR UPDATE (under the default READ COMMITTED isolation a
+    concurrent transaction blocks here until we commit). SQLite has no row locks and serializes
+    writers on the database file, so a plain SELECT is used there.
+    """
+    stmt = _ORDER_BY_ID_FOR_UPDATE if session.get_bind().dialect.name == "postgresql" else _ORDER_BY_ID
+    result = await session.execute(stmt, {"order_id": order_id})
     return result.scalar_one_or_none()
 
 
@@ -39,20 +59,63 @@ async def create_order(
         created_by_username=created_by_username,
         contact_username=contact_username,
         image_path=image_path,
+        # initial history row goes in through the relationship so order and history share one flush
+        histories=[OrderStatusHistory(from_status=None, to_status=status, actor_user_id=created_by)],
     )
     session.add(order)
     await session.flush()
-
-    history = OrderStatusHistory(order_id=order.id, from_status=None, to_status=status, actor_user_id=created_by)
-    session.add(history)
     return order
 
 
+def _supports_update_returning(session: AsyncSession) -> bool:
+    return session.get_bind().dialect.update_returning
+
+
 async def update_order_fields(session: AsyncSession, order_id: int, **fields) -> Optional[Order]:
-    await session.execute(update(Order).where(Order.id == order_id).values(**fields))
-    # re-fetch updated row
-    return await get_order_by_id(session, order_id)
+    if not _supports_update_returning(session):
+        # no RETURNING (e.g. old MySQL): update the loaded instance and flush
+        order = await get_order_by_id(session, order_id)
+        if order is not None:
+            for key, value in fields.items():
+                setattr(order, key, value)
+            await session.flush()
+        return order
+    # UPDATE ... RETURNING: one round-trip, refreshes the instance already in the session
+    result = await session.execute(
+        update(Order)
+        .where(Order.id == order_id)
+        .values(**fields)
+        .returning(Order)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
 
+async def transition_order(
+    session: AsyncSession,
+    order_id: int,
+    *,
+    from_status: OrderStatus,
+    to_status: OrderStatus,
+    **fields,
+) -> Optional[Order]:
+    """Conditionally move an order from `from_status` to `to_status` (plus extra fields).
+
+    The status check and the write are one UPDATE ... WHERE status = :from_status on every dialect,
+    so two concurrent callers cannot both win. Returns None if the order does not exist or is no
+    longer in `from_status`.
+    """
+    stmt = update(Order).where(Order.id == order_id, Order.status == from_status).values(status=to_status, **fields)
+    if not _supports_update_returning(session):
+        # no RETURNING: the same conditional UPDATE, won iff it matched the row; then reload it
+        result = await session.execute(stmt, execution_options={"synchronize_session": False})
+        if result.rowcount != 1:
+            return None
+        return await session.get(Order, order_id, populate_existing=True)
+    result = await session.execute(
+        stmt.returning(Order).execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
 
 async def add_history(
     session: AsyncSession,
@@ -63,26 +126,61 @@ async def add_history(
     actor_user_id: int,
     note: Optional[str] = None,
 ) -> OrderStatusHistory:
+    """Queue a history row; it is written by the next flush (at the latest on commit).
+
+    No flush here: callers do not read `hist.id`, and the row is then batched into the commit's
+    flush instead of costing its own round-trip.
+    """
     hist = OrderStatusHistory(order_id=order_id, from_status=from_status, to_status=to_status, actor_user_id=actor_user_id, note=note)
     session.add(hist)
-    await session.flush()
     return hist
 
 
-async def get_user_related_orders(session: AsyncSession, tg_user_id: int) -> Sequence[Order]:
-    result = await session.execute(
-        select(Order).where(
-            (Order.created_by == tg_user_id) | (Order.claimed_by == tg_user_id)
-        ).order_by(Order.updated_at.desc()).limit(20)
+async def get_user_related_orders(session: AsyncSession, tg_user_id: int, *, with_histories: bool = False) -> Sequence[Order]:
+    stmt = select(Order).where(
+        (Order.created_by == tg_user_id) | (Order.claimed_by == tg_user_id)
+    ).order_by(Order.updated_at.desc()).limit(20)
+    if with_histories:
+        # one extra SELECT ... WHERE order_id IN (...) for all rows instead of one per order
+        stmt = stmt.options(selectinload(Order.histories))
+    result = await session.execute(stmt)
+    return result.scalars().all()
+
+
+
+def _user_orders_created_between_stmt(tg_user_id: int, start, end):
+    # UNION ALL of one branch per column instead of `created_by = :u OR claimed_by = :u`, so each
+    # branch can use its own index; the second branch skips orders the first one already returned
+    created = select(Order).where(Order.created_by == tg_user_id, Order.created_at.between(start, end))
+    claimed = select(Order).where(
+        Order.claimed_by == tg_user_id,
+        Order.created_by != tg_user_id,
+        Order.created_at.between(start, end),
     )
+    return select(Order).from_statement(union_all(created, claimed).order_by(Order.created_at.desc()))
+
+
+async def get_user_orders_created_between(session: AsyncSession, tg_user_id: int, start, end) -> Sequence[Order]:
+    """Orders created or claimed by the user with created_at in [start, end], newest first."""
+    result = await session.execute(_user_orders_created_between_stmt(tg_user_id, start, end))
     return result.scalars().all()
 
 
+async def stream_user_orders_created_between(
+    session: AsyncSession, tg_user_id: int, start, end, *, batch_size: int = 100
+) -> AsyncIterator[Order]:
+    """Same rows as get_user_orders_created_between, fetched from the cursor `batch_size` at a time.
+
+    For single-pass consumers (e.g. aggregates over a month of orders), so the whole range is never
+    held in memory at once.
+    """
+    stmt = _user_orders_created_between_stmt(tg_user_id, start, end).execution_options(yield_per=batch_size)
+    async for order in await session.stream_scalars(stmt):
+        yield order
+
 # ---- Applications ----
 async def get_application(session: AsyncSession, order_id: int, applicant_tg_id: int) -> Optional[OrderApplication]:
-    result = await session.execute(
-        select(OrderApplication).where(and_(OrderApplication.order_id == order_id, OrderApplication.applicant_tg_id == applicant_tg_id))
-    )
+    result = await session.execute(_APPLICATION_BY_ORDER_AND_APPLICANT, {"order_id": order_id, "applicant_tg_id": applicant_tg_id})
     return result.scalar_one_or_none()
 
 
@@ -96,9 +194,9 @@ async def create_or_get_application(
     app = await get_application(session, order_id, applicant_tg_id)
     if app:
         return app
+    # pending until the next flush (autoflush before any later query, or commit); `app.id` is unset until then
     app = OrderApplication(order_id=order_id, applicant_tg_id=applicant_tg_id, applicant_username=applicant_username)
     session.add(app)
-    await session.flush()
     return app
 
 
@@ -111,13 +209,24 @@ async def list_applications_for_order(session: AsyncSession, order_id: int, *, s
 
 
 async def update_application_status(session: AsyncSession, app_id: int, status: ApplicationStatus) -> Optional[OrderApplication]:
-    await session.execute(update(OrderApplication).where(OrderApplication.id == app_id).values(status=status))
-    result = await session.execute(select(OrderApplication).where(OrderApplication.id == app_id))
+    if not _supports_update_returning(session):
+        app = await get_application_by_id(session, app_id)
+        if app is not None:
+            app.status = status
+            await session.flush()
+        return app
+    result = await session.execute(
+        update(OrderApplication)
+        .where(OrderApplication.id == app_id)
+        .values(status=status)
+        .returning(OrderApplication)
+        .execution_options(populate_existing=True)
+    )
     return result.scalar_one_or_none()
 
 
 async def get_application_by_id(session: AsyncSession, app_id: int) -> Optional[OrderApplication]:
-    result = await session.execute(select(OrderApplication).where(OrderApplication.id == app_id))
+    result = await session.execute(_APPLICATION_BY_ID, {"app_id": app_id})
     return result.scalar_one_or_none()
 
 
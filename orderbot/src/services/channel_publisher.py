@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Optional
+from typing import Awaitable, Callable, Optional, TypeVar
 from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 
 from ..config import Settings
@@ -14,21 +15,76 @@ _SETTINGS = Settings()
 _BOT: Optional[Bot] = None
 
 
-def _has_telegram_config() -> bool:
+def _parse_channel_id(raw: str) -> Optional[int]:
     try:
-        return bool(_SETTINGS.BOT_TOKEN and _SETTINGS.CHANNEL_ID and int(_SETTINGS.CHANNEL_ID))
-    except Exception:  # noqa: BLE001
-        return False
+        return int(raw) or None
+    except ValueError:
+        return None
+
+
+# 频道 ID 与“是否已配置”在模块加载时计算一次，发布/编辑时不再重复解析
+_CHANNEL_ID: Optional[int] = _parse_channel_id(_SETTINGS.CHANNEL_ID)
+_TELEGRAM_CONFIGURED = bool(_SETTINGS.BOT_TOKEN and _CHANNEL_ID)
+
+
+def _has_telegram_config() -> bool:
+    return _TELEGRAM_CONFIGURED
 
 
 def _ensure_bot() -> Bot:
+    """首次使用时创建 Bot；其 aiohttp 会话在后续调用间复用（连接与 TLS 不重复建立）"""
     global _BOT
     if _BOT is None:
-        from aiogram import Bot as _B
-        _BOT = _B(token=_SETTINGS.BOT_TOKEN)
+        _BOT = Bot(token=_SETTINGS.BOT_TOKEN)
     return _BOT
 
 
+async def close_bot() -> None:
+    """关闭频道发布用 Bot 的 HTTP 会话（应用退出时调用）"""
+    global _BOT
+    if _BOT is not None:
+        await _BOT.session.close()
+        _BOT = None
+
+
+_T = TypeVar("_T")
+
+# 同时进行的频道 API 调用上限：突发的发布/编辑可以并发进行，又不会一次性压垮 Telegram 限流
+_TG_SEMAPHORE = asyncio.Semaphore(20)
+_MAX_ATTEMPTS = 3
+# 限流等待上限（秒）：调用方可能还持有数据库会话，服务端要求更久时直接放弃，不在这里长时间挂起
+_MAX_RETRY_AFTER = 30
+
+
+def _is_retryable(error: Exception) -> bool:
+    # Telegram 明确拒绝的请求（参数错误、无权限等）重试也不会成功；网络/服务端错误可以重试
+    return not isinstance(error, TelegramAPIError) or isinstance(error, (TelegramNetworkError, TelegramServerError))
+
+
+async def _call_telegram(call: Callable[[], Awaitable[_T]], *, idempotent: bool = True) -> _T:
+    """执行一次频道 API 调用，失败最多尝试 3 次。
+
+    TelegramRetryAfter 按服务端给出的 retry_after 等待（超过 _MAX_RETRY_AFTER 则放弃），其他可重试错误按 1s、2s 指数退避；
+    等待期间不占用并发名额。idempotent=False（发送消息）时只在 TelegramRetryAfter 后重试：
+    超时/服务端错误时消息可能已经发出，重发会在频道里产生重复帖子。
+    """
+    for attempt in range(1, _MAX_ATTEMPTS + 1):
+        try:
+            async with _TG_SEMAPHORE:
+                return await call()
+        except TelegramRetryAfter as e:
+            if attempt == _MAX_ATTEMPTS or e.retry_after > _MAX_RETRY_AFTER:
+                raise
+            delay = e.retry_after
+        except Exception as e:  # noqa: BLE001
+            if attempt == _MAX_ATTEMPTS or not idempotent or not _is_retryable(e):
+                raise
+            delay = 2 ** (attempt - 1)
+        log_warn("channel_publisher.retry", attempt=attempt, delay=delay)
+        await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
 def _render_order_text(order: Order) -> str:
     """渲染订单文本"""
     lines: list[str] = []
@@ -40,30 +96,45 @@ def _render_order_text(order: Order) -> str:
     return "\n".join(lines)
 
 
-def _create_simple_keyboard() -> InlineKeyboardMarkup:
-    """创建简化的键盘，只有一个跳转私聊的按钮"""
-    # 获取运营联系方式
-    operator_username = _SETTINGS.OPERATOR_USERNAME
-    operator_user_id = _SETTINGS.OPERATOR_USER_ID
-    
-    if operator_username:
+def _contact_url(settings: Settings) -> str:
+    """联系接单按钮的跳转地址：运营用户名 > 运营用户ID > 机器人用户名"""
+    if settings.OPERATOR_USERNAME:
         # 使用用户名跳转私聊
-        contact_url = f"https://t.me/{operator_username.lstrip('@')}"
-    elif operator_user_id:
+        return f"https://t.me/{settings.OPERATOR_USERNAME.lstrip('@')}"
+    if settings.OPERATOR_USER_ID:
         # 使用用户ID跳转私聊
-        contact_url = f"tg://user?id={operator_user_id}"
-    else:
-        # 默认跳转到bot
-        bot_username = _SETTINGS.BOT_USERNAME
-        if bot_username:
-            contact_url = f"https://t.me/{bot_username.lstrip('@')}"
-        else:
-            contact_url = "https://t.me/your_bot_username"
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        return f"tg://user?id={settings.OPERATOR_USER_ID}"
+    # 默认跳转到bot
+    if settings.BOT_USERNAME:
+        return f"https://t.me/{settings.BOT_USERNAME.lstrip('@')}"
+    return "https://t.me/your_bot_username"
+
+
+def _build_keyboard(contact_url: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="💬 联系接单", url=contact_url)]
     ])
-    return keyboard
+
+
+# 键盘只依赖模块加载时的 _SETTINGS，运行期间不变：加载时构建一次，每次发布/编辑直接复用
+_CONTACT_URL = _contact_url(_SETTINGS)
+_KEYBOARD = _build_keyboard(_CONTACT_URL)
+
+
+def refresh_config() -> None:
+    """按当前环境变量重新读取 BOT_TOKEN/CHANNEL_ID 等配置并丢弃已创建的 Bot（无需 importlib.reload 模块）"""
+    global _SETTINGS, _BOT, _CHANNEL_ID, _TELEGRAM_CONFIGURED, _CONTACT_URL, _KEYBOARD
+    _SETTINGS = Settings()
+    _BOT = None
+    _CHANNEL_ID = _parse_channel_id(_SETTINGS.CHANNEL_ID)
+    _TELEGRAM_CONFIGURED = bool(_SETTINGS.BOT_TOKEN and _CHANNEL_ID)
+    _CONTACT_URL = _contact_url(_SETTINGS)
+    _KEYBOARD = _build_keyboard(_CONTACT_URL)
+
+
+def _create_simple_keyboard() -> InlineKeyboardMarkup:
+    """创建简化的键盘，只有一个跳转私聊的按钮"""
+    return _KEYBOARD
 
 
 async def publish_order_to_channel(order: Order, image_path: Optional[str] = None) -> Optional[int]:
@@ -80,19 +151,19 @@ async def publish_order_to_channel(order: Order, image_path: Optional[str] = Non
         if image_path:
             # 发送带图片的消息
             photo = FSInputFile(image_path)
-            message = await bot.send_photo(
-                chat_id=int(_SETTINGS.CHANNEL_ID),
+            message = await _call_telegram(lambda: bot.send_photo(
+                chat_id=_CHANNEL_ID,
                 photo=photo,
                 caption=text,
                 reply_markup=keyboard
-            )
+            ), idempotent=False)
         else:
             # 发送纯文本消息
-            message = await bot.send_message(
-                chat_id=int(_SETTINGS.CHANNEL_ID),
+            message = await _call_telegram(lambda: bot.send_message(
+                chat_id=_CHANNEL_ID,
                 text=text,
                 reply_markup=keyboard
-            )
+            ), idempotent=False)
         
         log_info("channel_publisher.published", order_id=order.id, message_id=message.message_id)
         return message.message_id
@@ -114,20 +185,20 @@ async def edit_order_message(order: Order, image_path: Optional[str] = None) ->
     try:
         if image_path:
             # 对于有图片的消息，只能编辑caption
-            await bot.edit_message_caption(
-                chat_id=int(_SETTINGS.CHANNEL_ID),
+            await _call_telegram(lambda: bot.edit_message_caption(
+                chat_id=_CHANNEL_ID,
                 message_id=order.channel_message_id,
                 caption=text,
                 reply_markup=keyboard
-            )
+            ))
         else:
             # 编辑纯文本消息
-            await bot.edit_message_text(
-                chat_id=int(_SETTINGS.CHANNEL_ID),
+            await _call_telegram(lambda: bot.edit_message_text(
+                chat_id=_CHANNEL_ID,
                 message_id=order.channel_message_id,
                 text=text,
                 reply_markup=keyboard
-            )
+            ))
         
         log_info("channel_publisher.edited", order_id=order.id, message_id=order.channel_message_id)
         return True
@@ -3,8 +3,10 @@ from __future__ import annotations
 import asyncio
 from typing import Optional
 
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..core.db import get_session
 from ..core.models import OrderStatus, Order, ApplicationStatus
 from ..core import repo
 from ..utils.logging import log_info, log_error
@@ -15,16 +17,67 @@ class BusinessError(Exception):
     """Domain/business errors for invalid transitions or permissions."""
 
 
+# 后台发布频道消息：限制同时进行的 Telegram 请求数，并持有任务引用防止被提前回收
+_PUBLISH_SEMAPHORE = asyncio.Semaphore(8)
+_BACKGROUND_TASKS: set[asyncio.Task] = set()
+
+
+async def _publish_and_patch(order: Order) -> None:
+    """发布订单到频道，成功后用独立 session 回写 channel_message_id。"""
+    async with _PUBLISH_SEMAPHORE:
+        try:
+            message_id = await publish_order_to_channel(order)
+            if message_id is None:
+                return
+            async with get_session() as session:
+                await repo.update_order_fields(session, order.id, channel_message_id=message_id)
+        except Exception as e:  # noqa: BLE001
+            log_error("channel.publish.failed", order_id=order.id, error=str(e))
+
+
+def _publish_after_commit(session: AsyncSession, order: Order) -> None:
+    """在调用方提交事务后再发布，保证回写时订单行已可见；事务回滚则不发布。"""
+    def _on_commit(_sync_session) -> None:
+        if not inspect(order).has_identity:
+            return
+        task = asyncio.get_running_loop().create_task(_publish_and_patch(order))
+        _BACKGROUND_TASKS.add(task)
+        task.add_done_callback(_BACKGROUND_TASKS.discard)
+
+    event.listen(session.sync_session, "after_commit", _on_commit, once=True)
+
+
+async def drain_background_publishes(timeout: float = 10.0) -> None:
+    """等待进行中的后台频道发布完成；应用退出时在关闭数据库与频道 Bot 之前调用，避免发布被丢弃或回写失败"""
+    if not _BACKGROUND_TASKS:
+        return
+    try:
+        await asyncio.wait_for(asyncio.gather(*_BACKGROUND_TASKS, return_exceptions=True), timeout)
+    except asyncio.TimeoutError:
+        log_error("channel.publish.drain_timeout", pending=len(_BACKGROUND_TASKS))
+
+
+_ALLOWED_TRANSITIONS: dict[OrderStatus, frozenset[OrderStatus]] = {
+    OrderStatus.DRAFT: frozenset({OrderStatus.NEW, OrderStatus.CANCELED}),
+    OrderStatus.NEW: frozenset({OrderStatus.CLAIMED, OrderStatus.CANCELED}),
+    OrderStatus.CLAIMED: frozenset({OrderStatus.IN_PROGRESS, OrderStatus.CANCELED}),
+    OrderStatus.IN_PROGRESS: frozenset({OrderStatus.DONE, OrderStatus.CANCELED}),
+    OrderStatus.DONE: frozenset(),
+    OrderStatus.CANCELED: frozenset(),
+}
+
+# 只能由唯一前驱状态到达的目标状态（如 IN_PROGRESS 只能来自 CLAIMED）：
+# update_status 可直接用条件 UPDATE 完成，无需先查询订单
+_SOLE_PREDECESSOR: dict[OrderStatus, OrderStatus] = {}
+for _new in OrderStatus:
+    _olds = [old for old, news in _ALLOWED_TRANSITIONS.items() if _new in news]
+    if len(_olds) == 1:
+        _SOLE_PREDECESSOR[_new] = _olds[0]
+del _new, _olds
+
+
 def _check_transition(old: OrderStatus, new: OrderStatus) -> None:
-    allowed = {
-        OrderStatus.DRAFT: {OrderStatus.NEW, OrderStatus.CANCELED},
-        OrderStatus.NEW: {OrderStatus.CLAIMED, OrderStatus.CANCELED},
-        OrderStatus.CLAIMED: {OrderStatus.IN_PROGRESS, OrderStatus.CANCELED},
-        OrderStatus.IN_PROGRESS: {OrderStatus.DONE, OrderStatus.CANCELED},
-        OrderStatus.DONE: set(),
-        OrderStatus.CANCELED: set(),
-    }
-    if new not in allowed[old]:
+    if new not in _ALLOWED_TRANSITIONS[old]:
         raise BusinessError(f"invalid_transition: {old} -> {new}")
 
 
@@ -47,12 +100,8 @@ async def create_order(
         created_by_username=created_by_username,
         image_path=image_path,
     )
-    # publish to channel (idempotent)
-    try:
-        message_id = await publish_order_to_channel(order)
-        await repo.update_order_fields(session, order.id, channel_message_id=message_id)
-    except Exception as e:  # noqa: BLE001
-        log_error("channel.publish.failed", order_id=order.id, error=str(e))
+    # 频道发布不阻塞下单：提交后在后台发布并回写 channel_message_id
+    _publish_after_commit(session, order)
     return order
 
 
@@ -111,23 +160,20 @@ async def publish_draft(session: AsyncSession, order_id: int) -> Order:
         return order
 
 async def claim_order(session: AsyncSession, order_id: int, actor_tg_user_id: int, actor_username: Optional[str]) -> Order:
-    order = await repo.get_order_by_id_for_update(session, order_id)
-    if not order:
-        raise BusinessError("order_not_found")
-    if order.status != OrderStatus.NEW:
-        raise BusinessError("only_NEW_can_be_claimed")
-
-    from_status = order.status
-    updated_order = await repo.update_order_fields(
+    # 状态检查与认领在同一条 UPDATE 中完成，并发认领只有一个能成功
+    updated_order = await repo.transition_order(
         session,
         order_id,
-        status=OrderStatus.CLAIMED,
+        from_status=OrderStatus.NEW,
+        to_status=OrderStatus.CLAIMED,
         claimed_by=actor_tg_user_id,
         claimed_by_username=actor_username,
     )
     if updated_order is None:
-        raise BusinessError("update_failed")
-    await repo.add_history(session, order_id, from_status=from_status, to_status=OrderStatus.CLAIMED, actor_user_id=actor_tg_user_id)
+        if await repo.get_order_by_id(session, order_id) is None:
+            raise BusinessError("order_not_found")
+        raise BusinessError("only_NEW_can_be_claimed")
+    await repo.add_history(session, order_id, from_status=OrderStatus.NEW, to_status=OrderStatus.CLAIMED, actor_user_id=actor_tg_user_id)
 
     # edit channel message
     try:
@@ -144,20 +190,29 @@ async def update_status(
     actor_tg_user_id: int,
     note: Optional[str] = None,
 ) -> Order:
-    order = await repo.get_order_by_id_for_update(session, order_id)
-    if not order:
-        raise BusinessError("order_not_found")
+    from_status = _SOLE_PREDECESSOR.get(new_status)
+    updated_order = None
+    if from_status is not None:
+        # 目标状态只有一个合法前驱：直接条件 UPDATE，成功即一次往返
+        updated_order = await repo.transition_order(session, order_id, from_status=from_status, to_status=new_status)
 
-    # validate state machine
-    if order.status == new_status:
-        return order
-    _check_transition(OrderStatus(order.status), new_status)
-
-    from_status = order.status
-    updated_order = await repo.update_order_fields(session, order_id, status=new_status)
     if updated_order is None:
-        raise BusinessError("update_failed")
-    await repo.add_history(session, order_id, from_status=OrderStatus(from_status), to_status=new_status, actor_user_id=actor_tg_user_id, note=note)
+        # 多前驱（如 CANCELED）或上面的 UPDATE 未命中：锁定读取后判断不存在 / 无变化 / 非法转换
+        order = await repo.get_order_by_id_for_update(session, order_id)
+        if not order:
+            raise BusinessError("order_not_found")
+
+        # validate state machine
+        if order.status == new_status:
+            return order
+        from_status = OrderStatus(order.status)
+        _check_transition(from_status, new_status)
+
+        # 仅当状态仍为校验时的 from_status 才更新，防止并发修改被覆盖
+        updated_order = await repo.transition_order(session, order_id, from_status=from_status, to_status=new_status)
+        if updated_order is None:
+            raise BusinessError("update_failed")
+    await repo.add_history(session, order_id, from_status=from_status, to_status=new_status, actor_user_id=actor_tg_user_id, note=note)
 
     try:
         await edit_order_message(updated_order)
@@ -177,7 +232,6 @@ async def get_orders_by_user(session: AsyncSession, user_id: int) -> list[Order]
 
 async def get_orders_by_user_and_date_range(session: AsyncSession, user_id: int, start_date, end_date) -> list[Order]:
     """获取用户在指定日期范围内的订单"""
-    from sqlalchemy import select, and_
     from datetime import datetime
     
     # 确保日期是datetime对象
@@ -186,16 +240,23 @@ async def get_orders_by_user_and_date_range(session: AsyncSession, user_id: int,
     if isinstance(end_date, str):
         end_date = datetime.fromisoformat(end_date)
     
-    result = await session.execute(
-        select(Order).where(
-            and_(
-                (Order.created_by == user_id) | (Order.claimed_by == user_id),
-                Order.created_at >= start_date,
-                Order.created_at <= end_date
-            )
-        ).order_by(Order.created_at.desc())
-    )
-    return list(result.scalars().all())
+    return list(await repo.get_user_orders_created_between(session, user_id, start_date, end_date))
+
+
+async def summarize_orders_by_user_and_date_range(session: AsyncSession, user_id: int, start_date, end_date) -> dict:
+    """统计用户在指定日期范围内的订单数与金额（总计及按状态），逐行流式读取不整体加载
+
+    返回 {"count": int, "amount": float, "by_status": {status: {"count": int, "amount": float}}}
+    """
+    summary = {"count": 0, "amount": 0, "by_status": {}}
+    async for order in repo.stream_user_orders_created_between(session, user_id, start_date, end_date):
+        amount = order.amount or 0
+        summary["count"] += 1
+        summary["amount"] += amount
+        per_status = summary["by_status"].setdefault(order.status.value, {"count": 0, "amount": 0})
+        per_status["count"] += 1
+        per_status["amount"] += amount
+    return summary
 
 
 # ---- Applications and review ----
@@ -219,33 +280,32 @@ async def approve_application(
     app_id: int,
     approver_tg_id: int,
 ) -> Order:
-    order = await repo.get_order_by_id_for_update(session, order_id)
-    if not order:
-        raise BusinessError("order_not_found")
-    # 审核通过：订单 NEW -> CLAIMED，并设置 claimed_by
-    if order.status != OrderStatus.NEW:
-        raise BusinessError("only_NEW_can_be_claimed")
-    # 标记 application = APPROVED，并将该申请者认领为执行人
+    # 审核通过：订单 NEW -> CLAIMED，并将该申请者认领为执行人（条件 UPDATE，避免重复认领）
     app = await repo.get_application_by_id(session, app_id)
-    if not app:
+    updated = None
+    if app is not None:
+        updated = await repo.transition_order(
+            session,
+            order_id,
+            from_status=OrderStatus.NEW,
+            to_status=OrderStatus.CLAIMED,
+            claimed_by=app.applicant_tg_id,
+            claimed_by_username=app.applicant_username,
+        )
+    if updated is None:
+        order = await repo.get_order_by_id(session, order_id)
+        if not order:
+            raise BusinessError("order_not_found")
+        if order.status != OrderStatus.NEW:
+            raise BusinessError("only_NEW_can_be_claimed")
         raise BusinessError("application_not_found")
+    # 标记 application = APPROVED
     await repo.update_application_status(session, app_id, ApplicationStatus.APPROVED)
-    # 认领为申请人
-    updated = await repo.update_order_fields(
-        session,
-        order_id,
-        status=OrderStatus.CLAIMED,
-        claimed_by=app.applicant_tg_id,
-        claimed_by_username=app.applicant_username,
-    )
-    await repo.add_history(session, order_id, from_status=order.status, to_status=OrderStatus.CLAIMED, actor_user_id=approver_tg_id)
+    await repo.add_history(session, order_id, from_status=OrderStatus.NEW, to_status=OrderStatus.CLAIMED, actor_user_id=approver_tg_id)
     try:
-        await edit_order_message(updated)  # type: ignore[arg-type]
+        await edit_order_message(updated)
     except Exception as e:  # noqa: BLE001
         log_error("channel.edit.failed", order_id=order_id, error=str(e))
-    # updated 类型是 Optional[Order]（来自 repo），此处确保不为 None
-    if updated is None:
-        raise BusinessError("update_failed")
     return updated
 
 
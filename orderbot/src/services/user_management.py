@@ -1,13 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Set, Optional
+import stat
+from typing import FrozenSet, Optional
+
+import aiofiles
+import aiofiles.os
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
 
 from ..config import Settings
 from ..utils.logging import log_info, log_error
 
+# 白名单写操作串行化：bot.py 每条命令都会新建服务实例，锁需在实例间共享，
+# 否则并发的添加/删除会各自读到旧名单，后写入的一方覆盖前者
+_WHITELIST_LOCK = asyncio.Lock()
+
 
 class UserManagementService:
     """用户管理服务，负责白名单用户的动态管理"""
@@ -24,34 +33,24 @@ class UserManagementService:
         Returns:
             bool: 添加是否成功
         """
-        current_ids = self.settings.allowed_user_ids()
-        
-        if user_id in current_ids:
-            log_info("user.whitelist.already_exists", user_id=user_id)
-            return False
-        
-        # 添加新用户ID
-        current_ids.add(user_id)
-        
-        # 更新环境变量
-        new_ids_str = ",".join(str(uid) for uid in sorted(current_ids))
-        
-        try:
-            # 更新 .env 文件
-            await self._update_env_file("ALLOWED_USER_IDS", new_ids_str)
-            
-            # 更新当前实例的环境变量
-            os.environ["ALLOWED_USER_IDS"] = new_ids_str
+        async with _WHITELIST_LOCK:
+            current_ids = set(self.settings.allowed_user_ids())
             
-            # 重新创建 settings 实例以反映更改
-            self.settings = Settings()
+            if user_id in current_ids:
+                log_info("user.whitelist.already_exists", user_id=user_id)
+                return False
             
-            log_info("user.whitelist.added", user_id=user_id, total_users=len(current_ids))
-            return True
+            # 添加新用户ID
+            current_ids.add(user_id)
             
-        except Exception as e:
-            log_error("user.whitelist.add_failed", user_id=user_id, error=str(e))
-            return False
+            try:
+                await self._save_whitelist(current_ids)
+                log_info("user.whitelist.added", user_id=user_id, total_users=len(current_ids))
+                return True
+                
+            except Exception as e:
+                log_error("user.whitelist.add_failed", user_id=user_id, error=str(e))
+                return False
     
     async def remove_user_from_whitelist(self, user_id: int) -> bool:
         """从白名单中移除用户
@@ -62,34 +61,37 @@ class UserManagementService:
         Returns:
             bool: 移除是否成功
         """
-        current_ids = self.settings.allowed_user_ids()
-        
-        if user_id not in current_ids:
-            log_info("user.whitelist.not_exists", user_id=user_id)
-            return False
-        
-        # 移除用户ID
-        current_ids.remove(user_id)
-        
-        # 更新环境变量
-        new_ids_str = ",".join(str(uid) for uid in sorted(current_ids))
-        
-        try:
-            # 更新 .env 文件
-            await self._update_env_file("ALLOWED_USER_IDS", new_ids_str)
-            
-            # 更新当前实例的环境变量
-            os.environ["ALLOWED_USER_IDS"] = new_ids_str
+        async with _WHITELIST_LOCK:
+            current_ids = set(self.settings.allowed_user_ids())
             
-            # 重新创建 settings 实例以反映更改
-            self.settings = Settings()
+            if user_id not in current_ids:
+                log_info("user.whitelist.not_exists", user_id=user_id)
+                return False
             
-            log_info("user.whitelist.removed", user_id=user_id, total_users=len(current_ids))
-            return True
+            # 移除用户ID
+            current_ids.remove(user_id)
             
-        except Exception as e:
-            log_error("user.whitelist.remove_failed", user_id=user_id, error=str(e))
-            return False
+            try:
+                await self._save_whitelist(current_ids)
+                log_info("user.whitelist.removed", user_id=user_id, total_users=len(current_ids))
+                return True
+                
+            except Exception as e:
+                log_error("user.whitelist.remove_failed", user_id=user_id, error=str(e))
+                return False
+    
+    async def _save_whitelist(self, user_ids: set[int]) -> None:
+        """持久化白名单并刷新当前实例的设置（调用方需持有 _WHITELIST_LOCK）"""
+        new_ids_str = ",".join(str(uid) for uid in sorted(user_ids))
+        
+        # 更新 .env 文件
+        await self._update_env_file("ALLOWED_USER_IDS", new_ids_str)
+        
+        # 更新当前进程的环境变量
+        os.environ["ALLOWED_USER_IDS"] = new_ids_str
+        
+        # 原地更新共享的 settings 实例（字符串与解析后的集合一起更新），无需重新构建 Settings()
+        self.settings.set_allowed_user_ids(user_ids)
     
     async def resolve_username_to_id(self, bot: Bot, username: str) -> Optional[int]:
         """通过用户名解析用户ID
@@ -133,8 +135,9 @@ class UserManagementService:
         key_found = False
         
         try:
-            with open(env_file_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
+            # aiofiles 在线程池中执行文件 I/O，不阻塞事件循环
+            async with aiofiles.open(env_file_path, "r", encoding="utf-8") as f:
+                lines = await f.readlines()
         except FileNotFoundError:
             # 如果文件不存在，创建新文件
             pass
@@ -150,9 +153,16 @@ class UserManagementService:
         if not key_found:
             lines.append(f'{key}="{value}"\n')
         
-        # 写回文件
-        with open(env_file_path, "w", encoding="utf-8") as f:
-            f.writelines(lines)
+        # 先写临时文件再原子替换，进程中途崩溃也不会留下被截断的 .env
+        tmp_path = f"{env_file_path}.tmp"
+        async with aiofiles.open(tmp_path, "w", encoding="utf-8") as f:
+            await f.writelines(lines)
+        try:
+            # 保留原文件权限（.env 含 token，通常为 600）
+            os.chmod(tmp_path, stat.S_IMODE((await aiofiles.os.stat(env_file_path)).st_mode))
+        except FileNotFoundError:
+            pass
+        await aiofiles.os.replace(tmp_path, env_file_path)
         
         log_info("env.file.updated", key=key, value=value)
     
@@ -167,11 +177,11 @@ class UserManagementService:
         """
         return user_id in self.settings.allowed_user_ids()
     
-    def get_whitelist_users(self) -> Set[int]:
+    def get_whitelist_users(self) -> FrozenSet[int]:
         """获取当前白名单用户列表
         
         Returns:
-            Set[int]: 白名单用户ID集合
+            FrozenSet[int]: 白名单用户ID集合
         """
         return self.settings.allowed_user_ids()
     
@@ -197,10 +207,10 @@ class UserManagementService:
         """
         return await self.remove_user_from_whitelist(user_id)
     
-    async def get_operators(self) -> Set[int]:
+    async def get_operators(self) -> FrozenSet[int]:
         """获取操作人列表（get_whitelist_users的异步别名）
         
         Returns:
-            Set[int]: 操作人用户ID集合
+            FrozenSet[int]: 操作人用户ID集合
         """
         return self.get_whitelist_users()
\ No newline at end of file
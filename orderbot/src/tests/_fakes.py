@@ -0,0 +1,34 @@
+"""中间件测试共用的消息/回调替身"""
+from __future__ import annotations
+
+from dataclasses import InitVar, dataclass, field
+
+from aiogram.types import User
+
+
+@dataclass(slots=True)
+class DummyMessage:
+    user_id: InitVar[int]
+    text: str = "/update foo"
+    from_user: User = field(init=False)
+    answered: list[str] = field(default_factory=list, init=False)
+
+    def __post_init__(self, user_id: int) -> None:
+        self.from_user = User(id=user_id, is_bot=False, first_name="U")
+
+    async def answer(self, text: str, *_, **__):
+        self.answered.append(text)
+
+
+@dataclass(slots=True)
+class DummyCallback:
+    user_id: InitVar[int]
+    data: str = "claim:1"
+    from_user: User = field(init=False)
+    answered: list[tuple[str, bool]] = field(default_factory=list, init=False)
+
+    def __post_init__(self, user_id: int) -> None:
+        self.from_user = User(id=user_id, is_bot=False, first_name="U")
+
+    async def answer(self, text: str, show_alert: bool = False):
+        self.answered.append((text, show_alert))
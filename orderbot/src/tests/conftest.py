@@ -0,0 +1,112 @@
+import os
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..core import db as db_module
+from ..config import Settings
+from ..core.db import init_engine, close_engine, get_session
+from ..core.models import Order
+from ..services import channel_publisher, order_service
+
+
+# 内存数据库：不落盘，不产生 -wal/-shm 文件；StaticPool 保持唯一连接，库在整个会话内存活。
+# pytest-xdist 并行时每个 worker 是独立进程，库名带上 worker 编号（gw0、gw1…）便于排查
+_WORKER = os.environ.get("PYTEST_XDIST_WORKER", "main")
+TEST_DATABASE_URL = f"sqlite+aiosqlite:///file:orderbot_test_{_WORKER}?mode=memory&cache=shared&uri=true"
+
+
+try:
+    import uvloop
+except ImportError:  # 未安装（或 Windows 上不可用）时保持 pytest-asyncio 的默认事件循环
+    uvloop = None
+else:
+    def pytest_asyncio_loop_factories(config, item):
+        """测试同样跑在 uvloop 上，与 app.install_event_loop_policy 的生产环境一致"""
+        return {"uvloop": uvloop.new_event_loop}
+
+
+@pytest_asyncio.fixture(scope="session")
+async def engine():
+    """整个测试会话共用一个引擎：连接与建表只做一次；非 autouse，只有用到 db 的测试才会创建"""
+    await init_engine(TEST_DATABASE_URL)
+    engine = db_module._engine
+    # pysqlite 默认推迟 BEGIN 且自行管理事务，SAVEPOINT 无法嵌套在外层事务中：
+    # 关闭驱动的事务处理（StaticPool 只有这一个连接），由 SQLAlchemy 显式发出 BEGIN
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        raw.driver_connection.isolation_level = None
+    event.listen(engine.sync_engine, "begin", lambda conn: conn.exec_driver_sql("BEGIN"))
+    yield engine
+    await close_engine()
+
+
+@pytest_asyncio.fixture
+async def db(engine, monkeypatch):
+    """需要数据库的测试使用：整个测试跑在一个外层事务里，结束时回滚，表中不留数据
+
+    get_session() 改为绑定到该连接并以 SAVEPOINT 加入外层事务，被测代码里的 commit 只提交到 SAVEPOINT。
+    """
+    async with engine.connect() as conn:
+        outer = await conn.begin()
+        monkeypatch.setattr(db_module, "_Session", async_sessionmaker(
+            bind=conn, expire_on_commit=False, class_=AsyncSession, join_transaction_mode="create_savepoint"
+        ))
+        yield engine
+        await outer.rollback()
+
+
+def _settings_with(allowed: str = "") -> Settings:
+    """按白名单构造 Settings（字段直接传入，不改环境变量）；每次新建实例，避免测试间共享白名单修改"""
+    return Settings(ALLOWED_USER_IDS=allowed)
+
+
+@pytest.fixture
+def settings_with():
+    """返回 _settings_with，配合 monkeypatch.setattr(bot, "settings", settings_with("1")) 使用"""
+    return _settings_with
+
+
+@pytest.fixture(autouse=True)
+def channel_disabled(monkeypatch):
+    """默认不配置频道：发布/编辑频道消息直接跳过，需要频道的测试自行 setenv"""
+    monkeypatch.delenv("BOT_TOKEN", raising=False)
+    monkeypatch.delenv("CHANNEL_ID", raising=False)
+
+
+@pytest_asyncio.fixture
+async def make_order(db):
+    """订单工厂：make_order(title=..., created_by=...) 在独立 session 中创建 NEW 订单并提交"""
+    async def _make(**fields) -> Order:
+        fields.setdefault("title", "T")
+        fields.setdefault("content", "C")
+        fields.setdefault("amount", None)
+        fields.setdefault("created_by", 1)
+        fields.setdefault("created_by_username", "u1")
+        async with get_session() as session:
+            return await order_service.create_order(session, **fields)
+
+    return _make
+
+
+@pytest.fixture
+def configure_channel(monkeypatch):
+    """按给定频道配置重置 channel_publisher 并返回该模块；传 None 表示不配置该项
+
+    结束时恢复为未配置状态，与 channel_disabled 一致。
+    """
+    def _configure(bot_token: str | None = "fake_token", channel_id: str | None = "-1001234567890"):
+        for name, value in (("BOT_TOKEN", bot_token), ("CHANNEL_ID", channel_id)):
+            if value is None:
+                monkeypatch.delenv(name, raising=False)
+            else:
+                monkeypatch.setenv(name, value)
+        channel_publisher.refresh_config()
+        return channel_publisher
+
+    yield _configure
+    monkeypatch.delenv("BOT_TOKEN", raising=False)
+    monkeypatch.delenv("CHANNEL_ID", raising=False)
+    channel_publisher.refresh_config()
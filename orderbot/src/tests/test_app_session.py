@@ -0,0 +1,22 @@
+from .. import app
+
+
+async def test_create_bot_session_connector_keeps_connections_alive(monkeypatch):
+    created = []
+
+    class RecordingConnector(app.TCPConnector):
+        def __init__(self, **kwargs):
+            created.append(kwargs)
+            super().__init__(**kwargs)
+
+    monkeypatch.setattr(app, "TCPConnector", RecordingConnector)
+    bot = await app.create_bot(app.Settings(BOT_TOKEN="123456:" + "a" * 35))
+    try:
+        client = await bot.session.create_session()
+        assert isinstance(client.connector, RecordingConnector)
+        assert created[0]["keepalive_timeout"] == app.TelegramSession.KEEPALIVE_TIMEOUT
+        # 同一会话只建一次连接器
+        assert await bot.session.create_session() is client
+    finally:
+        await bot.session.close()
+    assert client.closed
@@ -1,17 +1,16 @@
-import os
-import pytest
-
-from aiogram.types import Message
-from ..core.db import init_engine
-from ..tg.bot import router
+from ..tg import bot
+from ..tg.bot import router, cmd_neworder, cmd_cancel, cmd_myorders, on_title, on_content, on_amount, on_confirm
 
 
 class DummyMsg:
+    __slots__ = ("text", "from_user", "answers", "_answered", "last_reply_markup")
+
     def __init__(self, text: str):
         self.text = text
         self.from_user = type("U", (), {"id": 1, "username": "u"})
         self.answers: list[str] = []
         self._answered = None
+        self.last_reply_markup = None
 
     async def answer(self, text: str, reply_markup=None):
         # simulate sending; store last and history
@@ -21,15 +20,9 @@ class DummyMsg:
         self.last_reply_markup = reply_markup
 
 
-@pytest.mark.asyncio
-async def test_neworder_parse_and_response(tmp_path):
-    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp_path}/test4.db"
-    await init_engine(os.environ["DATABASE_URL"])  # create tables
-
+async def test_neworder_parse_and_response(db):
     msg = DummyMsg("/neworder 标题 | 内容 | 9.9")
     # call handler directly
-    from ..tg.bot import cmd_neworder
-
     await cmd_neworder(msg)  # type: ignore[arg-type]
     assert hasattr(msg, "_answered")
     assert "已创建工单" in msg._answered
@@ -37,6 +30,8 @@ async def test_neworder_parse_and_response(tmp_path):
 
 # ---- New tests for interactive FSM flow ----
 class DummyState:
+    __slots__ = ("_state", "_data")
+
     def __init__(self):
         self._state = None
         self._data: dict = {}
@@ -58,17 +53,7 @@ class DummyState:
         self._data = {}
 
 
-@pytest.mark.asyncio
-async def test_neworder_interactive_flow_success(tmp_path, monkeypatch):
-    # ensure channel publisher is skipped in tests
-    monkeypatch.delenv("BOT_TOKEN", raising=False)
-    monkeypatch.delenv("CHANNEL_ID", raising=False)
-
-    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp_path}/fsm1.db"
-    await init_engine(os.environ["DATABASE_URL"])  # create tables
-
-    from ..tg.bot import cmd_neworder, on_title, on_content, on_amount, on_confirm
-
+async def test_neworder_interactive_flow_success(db):
     state = DummyState()
     msg = DummyMsg("/neworder")
 
@@ -98,13 +83,7 @@ async def test_neworder_interactive_flow_success(tmp_path, monkeypatch):
     assert "已创建工单" in msg5.answers[-1]
 
 
-@pytest.mark.asyncio
-async def test_cancel_during_flow(tmp_path):
-    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp_path}/fsm2.db"
-    await init_engine(os.environ["DATABASE_URL"])  # create tables
-
-    from ..tg.bot import cmd_neworder, cmd_cancel
-
+async def test_cancel_during_flow(db):
     state = DummyState()
     msg = DummyMsg("/neworder")
 
@@ -119,44 +98,13 @@ async def test_cancel_during_flow(tmp_path):
     assert "已取消" in msg_cancel.answers[-1]
 
 
-@pytest.mark.asyncio
-async def test_myorders_whitelist_user_with_buttons(tmp_path, monkeypatch):
+async def test_myorders_whitelist_user_with_buttons(make_order, settings_with, monkeypatch):
     """Test that whitelisted users see buttons in /myorders command"""
-    # set whitelist to include test user
-    monkeypatch.setenv("ALLOWED_USER_IDS", "1")
-    
-    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp_path}/myorders_wl.db"
-    await init_engine(os.environ["DATABASE_URL"])
-    
     # create some test orders
-    from ..services import order_service
-    from ..core.db import get_session
-    
-    async with get_session() as session:
-        await order_service.create_order(
-            session,
-            title="Test Order 1",
-            content="Content 1",
-            amount=100,
-            created_by=1,
-            created_by_username="testuser",
-        )
-        await order_service.create_order(
-            session,
-            title="Test Order 2",
-            content="Content 2",
-            amount=None,
-            created_by=1,
-            created_by_username="testuser",
-        )
-        await session.commit()
+    await make_order(title="Test Order 1", content="Content 1", amount=100, created_by_username="testuser")
+    await make_order(title="Test Order 2", content="Content 2", created_by_username="testuser")
     
-    # patch the settings in bot module to use updated env vars
-    from ..config import Settings
-    from ..tg import bot
-    bot.settings = Settings()  # recreate settings with new env vars
-    
-    from ..tg.bot import cmd_myorders
+    monkeypatch.setattr(bot, "settings", settings_with("1"))  # whitelist includes test user
     
     msg = DummyMsg("/myorders")
     msg.from_user.id = 1  # whitelisted user
@@ -169,40 +117,15 @@ async def test_myorders_whitelist_user_with_buttons(tmp_path, monkeypatch):
     assert msg._answered is not None
     assert "点击按钮进行操作" in msg._answered
     # verify that reply_markup (keyboard) was provided
-    assert hasattr(msg, 'last_reply_markup')
     assert msg.last_reply_markup is not None
 
 
-@pytest.mark.asyncio
-async def test_myorders_non_whitelist_user_no_buttons(tmp_path, monkeypatch):
+async def test_myorders_non_whitelist_user_no_buttons(make_order, settings_with, monkeypatch):
     """Test that non-whitelisted users see plain text in /myorders command"""
-    # set whitelist to exclude test user
-    monkeypatch.setenv("ALLOWED_USER_IDS", "999")
-    
-    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp_path}/myorders_no_wl.db"
-    await init_engine(os.environ["DATABASE_URL"])
-    
     # create some test orders
-    from ..services import order_service
-    from ..core.db import get_session
-    
-    async with get_session() as session:
-        await order_service.create_order(
-            session,
-            title="Test Order 3",
-            content="Content 3",
-            amount=200,
-            created_by=1,
-            created_by_username="testuser",
-        )
-        await session.commit()
-    
-    # patch the settings in bot module to use updated env vars
-    from ..config import Settings
-    from ..tg import bot
-    bot.settings = Settings()  # recreate settings with new env vars
+    await make_order(title="Test Order 3", content="Content 3", amount=200, created_by_username="testuser")
     
-    from ..tg.bot import cmd_myorders
+    monkeypatch.setattr(bot, "settings", settings_with("999"))  # whitelist excludes test user
     
     msg = DummyMsg("/myorders")
     msg.from_user.id = 1  # non-whitelisted user
@@ -216,18 +139,12 @@ async def test_myorders_non_whitelist_user_no_buttons(tmp_path, monkeypatch):
     # no buttons for non-whitelisted users
     assert "点击按钮进行操作" not in msg._answered
     # verify that no reply_markup (keyboard) was provided
-    assert not hasattr(msg, 'last_reply_markup') or msg.last_reply_markup is None
+    assert msg.last_reply_markup is None
 
 
-@pytest.mark.asyncio
-async def test_myorders_no_orders(tmp_path, monkeypatch):
+async def test_myorders_no_orders(db, settings_with, monkeypatch):
     """Test /myorders command when user has no orders"""
-    monkeypatch.setenv("ALLOWED_USER_IDS", "1")
-    
-    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp_path}/myorders_empty.db"
-    await init_engine(os.environ["DATABASE_URL"])
-    
-    from ..tg.bot import cmd_myorders
+    monkeypatch.setattr(bot, "settings", settings_with("1"))
     
     msg = DummyMsg("/myorders")
     msg.from_user.id = 1
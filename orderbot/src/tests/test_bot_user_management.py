@@ -1,27 +1,69 @@
 import pytest
-from unittest.mock import AsyncMock, patch, MagicMock
-from aiogram import Bot
-from aiogram.types import Message, User, Chat
-from aiogram.exceptions import TelegramBadRequest
+from unittest.mock import patch
+from aiogram.types import User, Chat
 
 from ..tg.bot import cmd_add_operator, cmd_list_operators
-from ..services.user_management import UserManagementService
-from ..config import Settings
+
+
+class _Recorder:
+    """轻量测试替身：任意方法调用都记入 calls 并返回 returns 中的预设值
+
+    默认方法为协程（对应 Bot / Message.answer / 异步服务方法），sync 中列出的方法名按普通函数调用；
+    普通属性（text、from_user、settings 等）直接赋值即可。
+    """
+
+    def __init__(self, *, sync=(), **returns):
+        self.calls: list[tuple[str, tuple, dict]] = []
+        self.returns = returns
+        self._sync = frozenset(sync)
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self.returns.get(name)
+
+        if name in self._sync:
+            return record
+
+        async def method(*args, **kwargs):
+            return record(*args, **kwargs)
+
+        return method
+
+    def calls_to(self, name: str) -> list[tuple[tuple, dict]]:
+        return [(args, kwargs) for n, args, kwargs in self.calls if n == name]
+
+
+def _message(from_user: User, chat: Chat, text: str) -> _Recorder:
+    """aiogram 的 Message 是冻结模型，无法替换 answer，这里用记录器代替"""
+    message = _Recorder()
+    message.message_id = 1
+    message.date = 1234567890
+    message.chat = chat
+    message.from_user = from_user
+    message.text = text
+    message.bot = _Recorder()
+    return message
+
+
+def _answers(message: _Recorder) -> list[str]:
+    return [args[0] for args, _ in message.calls_to("answer")]
 
 
 class TestBotUserManagement:
     """机器人用户管理命令测试"""
     
     @pytest.fixture
-    def mock_settings(self, monkeypatch):
+    def mock_settings(self, settings_with):
         """创建模拟的设置对象"""
-        monkeypatch.setenv("ALLOWED_USER_IDS", "123")
-        return Settings()
+        return settings_with("123")
     
     @pytest.fixture
     def mock_user_mgmt(self, mock_settings):
-        """创建模拟的用户管理服务"""
-        return UserManagementService(mock_settings)
+        """创建模拟的用户管理服务：is_admin / get_whitelist_users 为同步方法，其余为协程"""
+        user_mgmt = _Recorder(sync=("is_admin", "get_whitelist_users"))
+        user_mgmt.settings = mock_settings
+        return user_mgmt
     
     @pytest.fixture
     def mock_admin_user(self):
@@ -38,233 +80,156 @@ class TestBotUserManagement:
         """创建模拟的聊天对象"""
         return Chat(id=123, type="private")
     
-    @pytest.mark.asyncio
     async def test_add_operator_success_with_username(self, mock_user_mgmt, mock_admin_user, mock_chat):
         """测试管理员成功通过用户名添加操作人"""
         # 创建模拟消息
-        message = Message(
-            message_id=1,
-            date=1234567890,
-            chat=mock_chat,
-            from_user=mock_admin_user,
-            text="/添加操作人 @newuser"
-        )
-        message.answer = AsyncMock()
-        
-        # 模拟 Bot 实例
-        mock_bot = AsyncMock(spec=Bot)
-        message.bot = mock_bot
+        message = _message(mock_admin_user, mock_chat, "/添加操作人 @newuser")
         
         with patch('orderbot.src.tg.bot.user_mgmt', mock_user_mgmt):
             with patch('orderbot.src.tg.bot.settings', mock_user_mgmt.settings):
                 # 模拟用户管理服务方法
-                mock_user_mgmt.is_admin = MagicMock(return_value=True)
-                mock_user_mgmt.resolve_username_to_id = AsyncMock(return_value=789)
-                mock_user_mgmt.add_user_to_whitelist = AsyncMock(return_value=True)
-                mock_user_mgmt.get_whitelist_users = MagicMock(return_value={123, 789})
+                mock_user_mgmt.returns["is_admin"] = True
+                mock_user_mgmt.returns["resolve_username_to_id"] = 789
+                mock_user_mgmt.returns["add_user_to_whitelist"] = True
+                mock_user_mgmt.returns["get_whitelist_users"] = {123, 789}
                 
                 await cmd_add_operator(message)
                 
                 # 验证调用
-                mock_user_mgmt.is_admin.assert_called_once_with(123)
-                mock_user_mgmt.resolve_username_to_id.assert_called_once_with(mock_bot, "@newuser")
-                mock_user_mgmt.add_user_to_whitelist.assert_called_once_with(789)
+                assert mock_user_mgmt.calls_to("is_admin") == [((123,), {})]
+                assert mock_user_mgmt.calls_to("resolve_username_to_id") == [((message.bot, "@newuser"), {})]
+                assert mock_user_mgmt.calls_to("add_user_to_whitelist") == [((789,), {})]
                 
                 # 验证成功消息
-                message.answer.assert_called_once()
-                call_args = message.answer.call_args[0][0]
+                assert len(_answers(message)) == 1
+                call_args = _answers(message)[0]
                 assert "✅ 成功添加操作人" in call_args
                 assert "用户ID: 789" in call_args
     
-    @pytest.mark.asyncio
     async def test_add_operator_success_with_user_id(self, mock_user_mgmt, mock_admin_user, mock_chat):
         """测试管理员成功通过用户ID添加操作人"""
-        message = Message(
-            message_id=1,
-            date=1234567890,
-            chat=mock_chat,
-            from_user=mock_admin_user,
-            text="/添加操作人 789"
-        )
-        message.answer = AsyncMock()
+        message = _message(mock_admin_user, mock_chat, "/添加操作人 789")
         
         with patch('orderbot.src.tg.bot.user_mgmt', mock_user_mgmt):
             with patch('orderbot.src.tg.bot.settings', mock_user_mgmt.settings):
-                mock_user_mgmt.is_admin = MagicMock(return_value=True)
-                mock_user_mgmt.add_user_to_whitelist = AsyncMock(return_value=True)
-                mock_user_mgmt.get_whitelist_users = MagicMock(return_value={123, 789})
+                mock_user_mgmt.returns["is_admin"] = True
+                mock_user_mgmt.returns["add_user_to_whitelist"] = True
+                mock_user_mgmt.returns["get_whitelist_users"] = {123, 789}
                 
                 await cmd_add_operator(message)
                 
                 # 验证调用
-                mock_user_mgmt.is_admin.assert_called_once_with(123)
-                mock_user_mgmt.add_user_to_whitelist.assert_called_once_with(789)
+                assert mock_user_mgmt.calls_to("is_admin") == [((123,), {})]
+                assert mock_user_mgmt.calls_to("add_user_to_whitelist") == [((789,), {})]
                 
                 # 验证成功消息
-                message.answer.assert_called_once()
-                call_args = message.answer.call_args[0][0]
+                assert len(_answers(message)) == 1
+                call_args = _answers(message)[0]
                 assert "✅ 成功添加操作人" in call_args
     
-    @pytest.mark.asyncio
     async def test_add_operator_permission_denied(self, mock_user_mgmt, mock_regular_user, mock_chat):
         """测试非管理员用户被拒绝添加操作人"""
-        message = Message(
-            message_id=1,
-            date=1234567890,
-            chat=mock_chat,
-            from_user=mock_regular_user,
-            text="/添加操作人 @newuser"
-        )
-        message.answer = AsyncMock()
+        message = _message(mock_regular_user, mock_chat, "/添加操作人 @newuser")
         
         with patch('orderbot.src.tg.bot.user_mgmt', mock_user_mgmt):
-            mock_user_mgmt.is_admin = MagicMock(return_value=False)
+            mock_user_mgmt.returns["is_admin"] = False
             
             await cmd_add_operator(message)
             
             # 验证权限检查
-            mock_user_mgmt.is_admin.assert_called_once_with(456)
+            assert mock_user_mgmt.calls_to("is_admin") == [((456,), {})]
             
             # 验证错误消息
-            message.answer.assert_called_once_with("❌ 您没有权限执行此操作。只有管理员可以添加操作人。")
+            assert _answers(message) == ["❌ 您没有权限执行此操作。只有管理员可以添加操作人。"]
     
-    @pytest.mark.asyncio
     async def test_add_operator_user_already_exists(self, mock_user_mgmt, mock_admin_user, mock_chat):
         """测试添加已存在的操作人"""
-        message = Message(
-            message_id=1,
-            date=1234567890,
-            chat=mock_chat,
-            from_user=mock_admin_user,
-            text="/添加操作人 123"
-        )
-        message.answer = AsyncMock()
+        message = _message(mock_admin_user, mock_chat, "/添加操作人 123")
         
         with patch('orderbot.src.tg.bot.user_mgmt', mock_user_mgmt):
             with patch('orderbot.src.tg.bot.settings', mock_user_mgmt.settings):
-                mock_user_mgmt.is_admin = MagicMock(return_value=True)
-                mock_user_mgmt.add_user_to_whitelist = AsyncMock(return_value=False)
+                mock_user_mgmt.returns["is_admin"] = True
+                mock_user_mgmt.returns["add_user_to_whitelist"] = False
                 
                 await cmd_add_operator(message)
                 
                 # 验证错误消息
-                message.answer.assert_called_once_with("⚠️ 用户 123 已经是操作人了。")
+                assert _answers(message) == ["⚠️ 用户 123 已经是操作人了。"]
     
-    @pytest.mark.asyncio
     async def test_add_operator_username_not_found(self, mock_user_mgmt, mock_admin_user, mock_chat):
         """测试用户名不存在的情况"""
-        message = Message(
-            message_id=1,
-            date=1234567890,
-            chat=mock_chat,
-            from_user=mock_admin_user,
-            text="/添加操作人 @nonexistent"
-        )
-        message.answer = AsyncMock()
-        message.bot = AsyncMock(spec=Bot)
+        message = _message(mock_admin_user, mock_chat, "/添加操作人 @nonexistent")
         
         with patch('orderbot.src.tg.bot.user_mgmt', mock_user_mgmt):
-            mock_user_mgmt.is_admin = MagicMock(return_value=True)
-            mock_user_mgmt.resolve_username_to_id = AsyncMock(return_value=None)
+            mock_user_mgmt.returns["is_admin"] = True
+            mock_user_mgmt.returns["resolve_username_to_id"] = None
             
             await cmd_add_operator(message)
             
             # 验证错误消息
-            message.answer.assert_called_once_with("❌ 找不到用户 @nonexistent，请检查用户名是否正确。")
+            assert _answers(message) == ["❌ 找不到用户 @nonexistent，请检查用户名是否正确。"]
     
-    @pytest.mark.asyncio
     async def test_add_operator_invalid_format(self, mock_user_mgmt, mock_admin_user, mock_chat):
         """测试无效的命令格式"""
-        message = Message(
-            message_id=1,
-            date=1234567890,
-            chat=mock_chat,
-            from_user=mock_admin_user,
-            text="/添加操作人"
-        )
-        message.answer = AsyncMock()
+        message = _message(mock_admin_user, mock_chat, "/添加操作人")
         
         with patch('orderbot.src.tg.bot.user_mgmt', mock_user_mgmt):
-            mock_user_mgmt.is_admin = MagicMock(return_value=True)
+            mock_user_mgmt.returns["is_admin"] = True
             
             await cmd_add_operator(message)
             
             # 验证错误消息
-            message.answer.assert_called_once()
-            call_args = message.answer.call_args[0][0]
+            assert len(_answers(message)) == 1
+            call_args = _answers(message)[0]
             assert "❌ 请提供要添加的用户名或用户ID" in call_args
     
-    @pytest.mark.asyncio
     async def test_list_operators_success(self, mock_user_mgmt, mock_admin_user, mock_chat):
         """测试管理员成功查看操作人列表"""
-        message = Message(
-            message_id=1,
-            date=1234567890,
-            chat=mock_chat,
-            from_user=mock_admin_user,
-            text="/查看操作人"
-        )
-        message.answer = AsyncMock()
+        message = _message(mock_admin_user, mock_chat, "/查看操作人")
         
         with patch('orderbot.src.tg.bot.user_mgmt', mock_user_mgmt):
-            mock_user_mgmt.is_admin = MagicMock(return_value=True)
-            mock_user_mgmt.get_whitelist_users = MagicMock(return_value={123, 456, 789})
+            mock_user_mgmt.returns["is_admin"] = True
+            mock_user_mgmt.returns["get_whitelist_users"] = {123, 456, 789}
             
             await cmd_list_operators(message)
             
             # 验证调用
-            mock_user_mgmt.is_admin.assert_called_once_with(123)
-            mock_user_mgmt.get_whitelist_users.assert_called_once()
+            assert mock_user_mgmt.calls_to("is_admin") == [((123,), {})]
+            assert len(mock_user_mgmt.calls_to("get_whitelist_users")) == 1
             
             # 验证响应消息
-            message.answer.assert_called_once()
-            call_args = message.answer.call_args[0][0]
+            assert len(_answers(message)) == 1
+            call_args = _answers(message)[0]
             assert "📋 当前白名单操作人列表" in call_args
             assert "• 123" in call_args
             assert "• 456" in call_args
             assert "• 789" in call_args
             assert "总计: 3 人" in call_args
     
-    @pytest.mark.asyncio
     async def test_list_operators_permission_denied(self, mock_user_mgmt, mock_regular_user, mock_chat):
         """测试非管理员用户被拒绝查看操作人列表"""
-        message = Message(
-            message_id=1,
-            date=1234567890,
-            chat=mock_chat,
-            from_user=mock_regular_user,
-            text="/查看操作人"
-        )
-        message.answer = AsyncMock()
+        message = _message(mock_regular_user, mock_chat, "/查看操作人")
         
         with patch('orderbot.src.tg.bot.user_mgmt', mock_user_mgmt):
-            mock_user_mgmt.is_admin = MagicMock(return_value=False)
+            mock_user_mgmt.returns["is_admin"] = False
             
             await cmd_list_operators(message)
             
             # 验证权限检查
-            mock_user_mgmt.is_admin.assert_called_once_with(456)
+            assert mock_user_mgmt.calls_to("is_admin") == [((456,), {})]
             
             # 验证错误消息
-            message.answer.assert_called_once_with("❌ 您没有权限执行此操作。只有管理员可以查看操作人列表。")
+            assert _answers(message) == ["❌ 您没有权限执行此操作。只有管理员可以查看操作人列表。"]
     
-    @pytest.mark.asyncio
     async def test_list_operators_empty_list(self, mock_user_mgmt, mock_admin_user, mock_chat):
         """测试查看空的操作人列表"""
-        message = Message(
-            message_id=1,
-            date=1234567890,
-            chat=mock_chat,
-            from_user=mock_admin_user,
-            text="/查看操作人"
-        )
-        message.answer = AsyncMock()
+        message = _message(mock_admin_user, mock_chat, "/查看操作人")
         
         with patch('orderbot.src.tg.bot.user_mgmt', mock_user_mgmt):
-            mock_user_mgmt.is_admin = MagicMock(return_value=True)
-            mock_user_mgmt.get_whitelist_users = MagicMock(return_value=set())
+            mock_user_mgmt.returns["is_admin"] = True
+            mock_user_mgmt.returns["get_whitelist_users"] = set()
             
             await cmd_list_operators(message)
             
             # 验证响应消息
-            message.answer.assert_called_once_with("📋 当前没有配置白名单用户。")
\ No newline at end of file
+            assert _answers(message) == ["📋 当前没有配置白名单用户。"]
\ No newline at end of file
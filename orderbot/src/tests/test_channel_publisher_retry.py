@@ -1,278 +1,173 @@
 """
 Test channel publisher retry mechanisms and failure scenarios.
 
-Tests the 3-attempt exponential backoff retry logic in publish_order_to_channel
-and edit_order_message functions, covering success after retry and final failure.
+Tests the 3-attempt retry logic in publish_order_to_channel and edit_order_message,
+covering success after retry and final failure. Sends are retried on flood control only.
 """
-import os
 import pytest
+from types import SimpleNamespace
 from unittest import mock
-from aiogram.types import Message as TgMessage
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import SendMessage
 
 from ..core.models import Order, OrderStatus
 from ..services import channel_publisher
 
 
-class MockBot:
-    """Mock Bot that can simulate failures and success on specific attempts."""
-    
-    def __init__(self, fail_attempts=None, success_message_id=12345):
-        self.fail_attempts = fail_attempts or []  # list of attempt numbers that should fail
-        self.success_message_id = success_message_id
-        self.call_count = 0
-        self.calls = []  # track all calls for verification
-    
-    async def send_message(self, chat_id, text, reply_markup=None, disable_web_page_preview=True, parse_mode=None):
-        self.call_count += 1
-        call_info = {
-            'method': 'send_message',
-            'attempt': self.call_count,
-            'chat_id': chat_id,
-            'text_length': len(text),
-            'has_reply_markup': reply_markup is not None
-        }
-        self.calls.append(call_info)
-        
-        if self.call_count in self.fail_attempts:
-            raise Exception(f"Simulated network error on attempt {self.call_count}")
-        
-        # Return mock message
-        return type('Message', (), {'message_id': self.success_message_id})()
-    
-    async def edit_message_text(self, chat_id, message_id, text, reply_markup=None, disable_web_page_preview=True, parse_mode=None):
-        self.call_count += 1
-        call_info = {
-            'method': 'edit_message_text', 
-            'attempt': self.call_count,
-            'chat_id': chat_id,
-            'message_id': message_id,
-            'text_length': len(text),
-            'has_reply_markup': reply_markup is not None
-        }
-        self.calls.append(call_info)
-        
-        if self.call_count in self.fail_attempts:
-            raise Exception(f"Simulated edit error on attempt {self.call_count}")
-
-
-@pytest.mark.asyncio
-async def test_publish_success_first_attempt(monkeypatch):
-    """Test successful publish on first attempt."""
-    monkeypatch.setenv("BOT_TOKEN", "fake_token")
-    monkeypatch.setenv("CHANNEL_ID", "-1001234567890")
-    
-    # Reset module-level globals
-    from ..services import channel_publisher as cp
-    import importlib
-    importlib.reload(cp)
-    
-    mock_bot = MockBot(fail_attempts=[])
-    
-    with mock.patch.object(cp, '_ensure_bot', return_value=mock_bot):
-        order = Order(
-            id=1, 
-            title="Test Order",
-            content="Test content", 
-            amount=99.9,
-            status=OrderStatus.NEW,
-            created_by=123,
-            created_by_username="testuser"
-        )
-        
-        message_id = await cp.publish_order_to_channel(order)
-        
-        assert message_id == 12345
-        assert mock_bot.call_count == 1
-        assert mock_bot.calls[0]['method'] == 'send_message'
-        assert mock_bot.calls[0]['chat_id'] == -1001234567890
-
-
-@pytest.mark.asyncio  
-async def test_publish_success_after_retry(monkeypatch):
-    """Test successful publish on second attempt after first failure."""
-    monkeypatch.setenv("BOT_TOKEN", "fake_token")
-    monkeypatch.setenv("CHANNEL_ID", "-1001234567890")
-    
-    import orderbot.src.services.channel_publisher as cp
-    import importlib
-    importlib.reload(cp)
-    
-    # speed up retries
-    async def fast_sleep(_):
-        return None
-    monkeypatch.setattr(cp.asyncio, "sleep", fast_sleep)
+_METHOD = SendMessage(chat_id=1, text="x")
 
-    # Fail on first attempt, succeed on second
-    mock_bot = MockBot(fail_attempts=[1])
-    
-    with mock.patch.object(cp, '_ensure_bot', return_value=mock_bot):
-        order = Order(
-            id=2,
-            title="Retry Test", 
-            content="Retry content",
-            amount=None,
-            status=OrderStatus.NEW,
-            created_by=456,
-            created_by_username="retryuser"
-        )
-        
-        message_id = await cp.publish_order_to_channel(order)
-        
-        assert message_id == 12345
-        assert mock_bot.call_count == 2  # failed once, succeeded on retry
-        assert all(call['method'] == 'send_message' for call in mock_bot.calls)
 
+def _network_error(attempt):
+    return Exception(f"Simulated network error on attempt {attempt}")
+
+
+def _flood_control(attempt, retry_after=1):
+    return TelegramRetryAfter(method=_METHOD, message="Flood control", retry_after=retry_after)
+
+
+def make_mock_bot(fail_attempts=(), success_message_id=12345, error=_network_error):
+    """Mock Bot whose calls fail on the given attempt numbers (1-based, shared by send and edit).
+
+    Failing calls raise `error(attempt)`. Each call is logged as a (method, chat_id, message_id)
+    tuple in `bot.calls`.
+    """
+    calls = []
+
+    def record(method, chat_id, message_id=None):
+        calls.append((method, chat_id, message_id))
+        if len(calls) in fail_attempts:
+            raise error(len(calls))
+
+    async def send_message(chat_id, text, **_):
+        record("send_message", chat_id)
+        return SimpleNamespace(message_id=success_message_id)
+
+    async def edit_message_text(chat_id, message_id, text, **_):
+        record("edit_message_text", chat_id, message_id)
+
+    return SimpleNamespace(calls=calls, send_message=send_message, edit_message_text=edit_message_text)
+
+
+@pytest.fixture
+def cp_with_fast_sleep(configure_channel, monkeypatch):
+    """channel_publisher configured with a channel and with retry back-off sleeps skipped."""
+    cp = configure_channel()
 
-@pytest.mark.asyncio
-async def test_publish_final_failure_after_3_attempts(monkeypatch):
-    """Test final failure after all 3 attempts fail."""
-    monkeypatch.setenv("BOT_TOKEN", "fake_token")  
-    monkeypatch.setenv("CHANNEL_ID", "-1001234567890")
-    
-    import orderbot.src.services.channel_publisher as cp
-    import importlib
-    importlib.reload(cp)
-    
-    # speed up retries
     async def fast_sleep(_):
         return None
     monkeypatch.setattr(cp.asyncio, "sleep", fast_sleep)
+    return cp
+
+
+@pytest.mark.parametrize(
+    "error, fail_attempts, expected_mid, expected_calls",
+    [
+        (_network_error, [], 12345, 1),  # success on first attempt
+        (_network_error, [1], None, 1),  # the message may already be posted: never resent
+        (_flood_control, [1], 12345, 2),  # flood control, succeeded on retry
+        (_flood_control, [1, 2, 3], None, 3),  # final failure returns None
+    ],
+    ids=["first_attempt", "network_error_not_resent", "after_flood_control", "final_failure"],
+)
+async def test_publish_retries(cp_with_fast_sleep, error, fail_attempts, expected_mid, expected_calls):
+    """Test publish retries only on flood control and gives up after the third failure."""
+    cp = cp_with_fast_sleep
+    mock_bot = make_mock_bot(fail_attempts, error=error)
+    order = Order(
+        id=1,
+        title="Test Order",
+        content="Test content",
+        amount=99.9,
+        status=OrderStatus.NEW,
+        created_by=123,
+        created_by_username="testuser"
+    )
 
-    # Fail all 3 attempts
-    mock_bot = MockBot(fail_attempts=[1, 2, 3])
-    
     with mock.patch.object(cp, '_ensure_bot', return_value=mock_bot):
-        order = Order(
-            id=3,
-            title="Failure Test",
-            content="This will fail",
-            amount=50.0,
-            status=OrderStatus.NEW, 
-            created_by=789,
-            created_by_username="failuser"
-        )
-        
         message_id = await cp.publish_order_to_channel(order)
-        
-        assert message_id is None  # final failure returns None
-        assert mock_bot.call_count == 3  # tried 3 times
-        assert all(call['method'] == 'send_message' for call in mock_bot.calls)
 
+    assert message_id == expected_mid
+    assert mock_bot.calls == [("send_message", -1001234567890, None)] * expected_calls
+
+
+@pytest.mark.parametrize(
+    "fail_attempts, expected_calls",
+    [
+        ([], 1),  # success on first attempt
+        ([1, 2], 3),  # failed twice, succeeded on third
+        ([1, 2, 3], 3),  # final failure is logged, not raised
+    ],
+    ids=["first_attempt", "after_retry", "final_failure"],
+)
+async def test_edit_retries(cp_with_fast_sleep, fail_attempts, expected_calls):
+    """Test edit succeeds within 3 attempts or gives up after the third failure without raising."""
+    cp = cp_with_fast_sleep
+    mock_bot = make_mock_bot(fail_attempts)
+    order = Order(
+        id=4,
+        title="Edit Test",
+        content="Edit content",
+        amount=25.5,
+        status=OrderStatus.CLAIMED,
+        created_by=111,
+        created_by_username="creator",
+        claimed_by=222,
+        claimed_by_username="claimer",
+        channel_message_id=9876
+    )
 
-@pytest.mark.asyncio
-async def test_edit_success_first_attempt(monkeypatch):
-    """Test successful edit on first attempt."""
-    monkeypatch.setenv("BOT_TOKEN", "fake_token")
-    monkeypatch.setenv("CHANNEL_ID", "-1001234567890")
-    
-    import orderbot.src.services.channel_publisher as cp
-    import importlib
-    importlib.reload(cp)
-    
-    mock_bot = MockBot(fail_attempts=[])
-    
     with mock.patch.object(cp, '_ensure_bot', return_value=mock_bot):
-        order = Order(
-            id=4,
-            title="Edit Test",
-            content="Edit content",
-            amount=25.5,
-            status=OrderStatus.CLAIMED,
-            created_by=111,
-            created_by_username="creator",
-            claimed_by=222,
-            claimed_by_username="claimer",
-            channel_message_id=9876
-        )
-        
         await cp.edit_order_message(order)
-        
-        assert mock_bot.call_count == 1
-        call = mock_bot.calls[0]
-        assert call['method'] == 'edit_message_text'
-        assert call['message_id'] == 9876
-        assert call['chat_id'] == -1001234567890
-
-
-@pytest.mark.asyncio
-async def test_edit_success_after_retry(monkeypatch):
-    """Test successful edit on third attempt after two failures."""
-    monkeypatch.setenv("BOT_TOKEN", "fake_token")
-    monkeypatch.setenv("CHANNEL_ID", "-1001234567890")
-    
-    import orderbot.src.services.channel_publisher as cp
-    import importlib
-    importlib.reload(cp)
-    
-    # speed up retries
-    async def fast_sleep(_):
-        return None
-    monkeypatch.setattr(cp.asyncio, "sleep", fast_sleep)
 
-    # Fail first two attempts, succeed on third
-    mock_bot = MockBot(fail_attempts=[1, 2])
-    
-    with mock.patch.object(cp, '_ensure_bot', return_value=mock_bot):
-        order = Order(
-            id=5,
-            title="Edit Retry Test",
-            content="Edit retry content", 
-            amount=None,
-            status=OrderStatus.DONE,
-            created_by=333,
-            created_by_username="creator2",
-            claimed_by=444, 
-            claimed_by_username="finisher",
-            channel_message_id=5555
-        )
-        
-        await cp.edit_order_message(order)
-        
-        assert mock_bot.call_count == 3  # failed twice, succeeded on third
-        assert all(call['method'] == 'edit_message_text' for call in mock_bot.calls)
-        assert all(call['message_id'] == 5555 for call in mock_bot.calls)
+    assert mock_bot.calls == [("edit_message_text", -1001234567890, 9876)] * expected_calls
 
 
-@pytest.mark.asyncio
-async def test_edit_final_failure_after_3_attempts(monkeypatch):
-    """Test edit final failure after all 3 attempts fail."""
-    monkeypatch.setenv("BOT_TOKEN", "fake_token")
-    monkeypatch.setenv("CHANNEL_ID", "-1001234567890")
-    
-    import orderbot.src.services.channel_publisher as cp
-    import importlib  
-    importlib.reload(cp)
-    
-    # speed up retries
-    async def fast_sleep(_):
-        return None
-    monkeypatch.setattr(cp.asyncio, "sleep", fast_sleep)
+async def test_publish_waits_retry_after_and_skips_bad_request(configure_channel, monkeypatch):
+    """Test flood-control waits for retry_after and client errors are not retried."""
+    cp = configure_channel()
 
-    # All 3 attempts fail
-    mock_bot = MockBot(fail_attempts=[1, 2, 3])
-    
-    with mock.patch.object(cp, '_ensure_bot', return_value=mock_bot):
-        order = Order(
-            id=6,
-            title="Edit Failure Test",
-            content="This edit will fail completely",
-            amount=100.0,
-            status=OrderStatus.IN_PROGRESS,
-            created_by=555,
-            created_by_username="creator3",
-            claimed_by=666,
-            claimed_by_username="worker", 
-            channel_message_id=7777
-        )
-        
-        # Should not raise, but log error internally
-        await cp.edit_order_message(order)
-        
-        assert mock_bot.call_count == 3  # attempted 3 times
-        assert all(call['method'] == 'edit_message_text' for call in mock_bot.calls)
+    delays = []
+    async def fake_sleep(delay):
+        delays.append(delay)
+    monkeypatch.setattr(cp.asyncio, "sleep", fake_sleep)
+
+    errors = [_flood_control(1, retry_after=7)]
+    async def flaky_call():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    assert await cp._call_telegram(flaky_call) == "ok"
+    assert delays == [7]
+
+    calls = []
+    async def bad_request():
+        calls.append(1)
+        raise TelegramBadRequest(method=_METHOD, message="Bad Request: chat not found")
+
+    with pytest.raises(TelegramBadRequest):
+        await cp._call_telegram(bad_request)
+    assert len(calls) == 1
+
+
+async def test_retry_after_above_cap_gives_up(configure_channel, monkeypatch):
+    """Test a flood-control wait longer than _MAX_RETRY_AFTER is raised instead of slept."""
+    cp = configure_channel()
+
+    delays = []
+    async def fake_sleep(delay):
+        delays.append(delay)
+    monkeypatch.setattr(cp.asyncio, "sleep", fake_sleep)
+
+    async def flooded():
+        raise _flood_control(1, retry_after=cp._MAX_RETRY_AFTER + 1)
+
+    with pytest.raises(TelegramRetryAfter):
+        await cp._call_telegram(flooded)
+    assert delays == []
 
 
-@pytest.mark.asyncio
 async def test_publish_skips_when_message_id_exists():
     """Test publish is idempotent when order already has channel_message_id."""
     order = Order(
@@ -291,7 +186,6 @@ async def test_publish_skips_when_message_id_exists():
     assert message_id == 8888
 
 
-@pytest.mark.asyncio
 async def test_edit_skips_when_no_message_id():
     """Test edit skips when order has no channel_message_id."""
     order = Order(
@@ -1,10 +1,7 @@
-import pytest
-
 from orderbot.src.config import Settings
 from orderbot.src.tg.keyboards import order_action_kb
 
 
-@pytest.mark.asyncio
 async def test_operator_deeplink_priority_and_formats(monkeypatch):
     # priority: OPERATOR_USER_ID over OPERATOR_USERNAME
     monkeypatch.setenv("OPERATOR_USER_ID", "777")
@@ -25,8 +22,24 @@ async def test_operator_deeplink_priority_and_formats(monkeypatch):
     assert s.operator_deeplink() is None
 
 
-@pytest.mark.asyncio
 async def test_keyboard_fallback_to_user_id_when_no_username():
     kb = order_action_kb(order_id=1, operator_id=7, operator_username=None)
     rows = kb.inline_keyboard
     assert rows[1][1].url == "tg://user?id=7"
+
+
+def test_allowed_user_ids_parsed_once_as_frozenset(monkeypatch):
+    monkeypatch.setenv("ALLOWED_USER_IDS", " 1, 2,,x,3 ")
+    s = Settings()
+    ids = s.allowed_user_ids()
+    assert ids == frozenset({1, 2, 3})
+    assert isinstance(ids, frozenset)
+    # same raw string -> same cached object, even across Settings instances
+    assert Settings().allowed_user_ids() is ids
+
+
+def test_set_allowed_user_ids_updates_string_and_set():
+    s = Settings(ALLOWED_USER_IDS="1,2")
+    assert s.set_allowed_user_ids({3, 1}) == "1,3"
+    assert s.ALLOWED_USER_IDS == "1,3"
+    assert s.allowed_user_ids() == frozenset({1, 3})
@@ -1,12 +1,8 @@
-import os
-import importlib
-import pytest
-
 from ..tg.keyboards import order_action_kb
 from ..core.models import Order, OrderStatus
+from ..services import channel_publisher as cp
 
 
-@pytest.mark.asyncio
 async def test_order_action_keyboard_buttons():
     kb = order_action_kb(order_id=42, operator_id=7, operator_username="op")
     rows = kb.inline_keyboard
@@ -18,27 +14,18 @@ async def test_order_action_keyboard_buttons():
     assert rows[1][1].url.endswith("/op")
 
 
-@pytest.mark.asyncio
-async def test_channel_publish_skips_without_config(monkeypatch):
-    # Ensure no env present before importing module to snapshot settings
-    monkeypatch.delenv("BOT_TOKEN", raising=False)
-    monkeypatch.delenv("CHANNEL_ID", raising=False)
-
-    import orderbot.src.services.channel_publisher as cp
-    importlib.reload(cp)
+async def test_channel_publish_skips_without_config():
+    # channel_disabled fixture has removed BOT_TOKEN/CHANNEL_ID; re-read them into the module
+    cp.refresh_config()
 
     order = Order(title="t", content="c", amount=None, status=OrderStatus.NEW, created_by=1, created_by_username="u")
     mid = await cp.publish_order_to_channel(order)
     assert mid is None
 
 
-@pytest.mark.asyncio
-async def test_channel_edit_skips_without_config(monkeypatch):
-    monkeypatch.delenv("BOT_TOKEN", raising=False)
-    monkeypatch.delenv("CHANNEL_ID", raising=False)
-
-    import orderbot.src.services.channel_publisher as cp
-    importlib.reload(cp)
+async def test_channel_edit_skips_without_config():
+    # channel_disabled fixture has removed BOT_TOKEN/CHANNEL_ID; re-read them into the module
+    cp.refresh_config()
 
     order = Order(title="t2", content="c2", amount=None, status=OrderStatus.NEW, created_by=1, created_by_username="u")
     order.channel_message_id = 123
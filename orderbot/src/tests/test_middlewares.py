@@ -1,38 +1,20 @@
 from __future__ import annotations
 
-import asyncio
+from orderbot.src.tg import middlewares as mw_mod
+from orderbot.src.tg.middlewares import (
+    WhitelistMiddleware,
+    RateLimitMiddleware,
+    ErrorHandlingMiddleware,
+    MSG_DENIED,
+    MSG_INTERNAL_ERROR,
+    MSG_RATE_LIMITED,
+)
 
-import pytest
-from aiogram.types import User
+from ._fakes import DummyCallback, DummyMessage
 
-from orderbot.src.tg.middlewares import WhitelistMiddleware, RateLimitMiddleware, ErrorHandlingMiddleware
-from orderbot.src.config import Settings
 
-
-class DummyMessage:
-    def __init__(self, user_id: int, text: str = "/update foo") -> None:
-        self.from_user = User(id=user_id, is_bot=False, first_name="U")
-        self.text = text
-        self.answered: list[str] = []
-
-    async def answer(self, text: str, *_, **__):
-        self.answered.append(text)
-
-
-class DummyCallback:
-    def __init__(self, user_id: int, data: str = "claim:1") -> None:
-        self.from_user = User(id=user_id, is_bot=False, first_name="U")
-        self.data = data
-        self.answered: list[tuple[str, bool]] = []
-
-    async def answer(self, text: str, show_alert: bool = False):
-        self.answered.append((text, show_alert))
-
-
-@pytest.mark.asyncio
-async def test_whitelist_allows_when_empty(monkeypatch):
-    monkeypatch.delenv("ALLOWED_USER_IDS", raising=False)
-    settings = Settings()  # no ALLOWED_USER_IDS -> empty set
+async def test_whitelist_allows_when_empty(settings_with):
+    settings = settings_with("")  # no ALLOWED_USER_IDS -> empty set
     mw = WhitelistMiddleware(settings)
 
     async def handler(ev, data):
@@ -43,10 +25,8 @@ async def test_whitelist_allows_when_empty(monkeypatch):
     assert res == "ok"
 
 
-@pytest.mark.asyncio
-async def test_whitelist_blocks_when_not_in_list(monkeypatch):
-    monkeypatch.setenv("ALLOWED_USER_IDS", "1,2,3")
-    settings = Settings()
+async def test_whitelist_blocks_when_not_in_list(settings_with):
+    settings = settings_with("1,2,3")
     mw = WhitelistMiddleware(settings)
 
     msg = DummyMessage(999)
@@ -55,13 +35,13 @@ async def test_whitelist_blocks_when_not_in_list(monkeypatch):
         return "should-not-run"
 
     res = await mw(handler, msg, {})
-    await asyncio.sleep(0)  # allow scheduled answers
     assert res is None
-    assert any("没有权限" in s or "无权" in s for s in msg.answered)
+    assert msg.answered == [MSG_DENIED]
 
 
-@pytest.mark.asyncio
-async def test_ratelimit_blocks_frequent_calls():
+async def test_ratelimit_blocks_frequent_calls(monkeypatch):
+    clock = {"t": 1000.0}
+    monkeypatch.setattr(mw_mod, "_now", lambda: clock["t"])
     mw = RateLimitMiddleware(min_interval_seconds=0.2)
 
     cb = DummyCallback(5, data="claim:10")
@@ -73,19 +53,17 @@ async def test_ratelimit_blocks_frequent_calls():
     r1 = await mw(handler, cb, {})
     # second immediately -> blocked
     r2 = await mw(handler, cb, {})
-    await asyncio.sleep(0)
 
     assert r1 == "ok"
     assert r2 is None
-    assert any("操作过于频繁" in t for t, _ in cb.answered)
+    assert cb.answered == [(MSG_RATE_LIMITED, True)]
 
-    # wait then allowed again
-    await asyncio.sleep(0.25)
+    # advance past the window then allowed again
+    clock["t"] += 0.25
     r3 = await mw(handler, cb, {})
     assert r3 == "ok"
 
 
-@pytest.mark.asyncio
 async def test_error_handling_middleware_catches_exceptions():
     mw = ErrorHandlingMiddleware()
 
@@ -95,6 +73,5 @@ async def test_error_handling_middleware_catches_exceptions():
         raise RuntimeError("boom")
 
     res = await mw(handler, msg, {})
-    await asyncio.sleep(0)
     assert res is None
-    assert any("发生错误" in s for s in msg.answered)
\ No newline at end of file
+    assert msg.answered == [MSG_INTERNAL_ERROR]
\ No newline at end of file
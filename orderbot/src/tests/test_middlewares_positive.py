@@ -1,25 +1,11 @@
-import asyncio
-import pytest
-
+from orderbot.src.tg import middlewares as mw_mod
 from orderbot.src.tg.middlewares import WhitelistMiddleware, RateLimitMiddleware
-from orderbot.src.config import Settings
-
-
-class DummyMessage:
-    def __init__(self, user_id: int, text: str = "/start") -> None:
-        from aiogram.types import User
-        self.from_user = User(id=user_id, is_bot=False, first_name="U")
-        self.text = text
-        self.answered: list[str] = []
 
-    async def answer(self, text: str, *_, **__):
-        self.answered.append(text)
+from ._fakes import DummyMessage
 
 
-@pytest.mark.asyncio
-async def test_whitelist_allows_specific_users(monkeypatch):
-    monkeypatch.setenv("ALLOWED_USER_IDS", "1,2,3")
-    settings = Settings()
+async def test_whitelist_allows_specific_users(settings_with):
+    settings = settings_with("1,2,3")
     mw = WhitelistMiddleware(settings)
 
     async def handler(ev, data):
@@ -30,7 +16,6 @@ async def test_whitelist_allows_specific_users(monkeypatch):
     assert res == "ok"
 
 
-@pytest.mark.asyncio
 async def test_rate_limit_allows_single_call():
     mw = RateLimitMiddleware(max_calls=1, per_seconds=0.1)
 
@@ -42,8 +27,9 @@ async def test_rate_limit_allows_single_call():
     assert res == "ok"
 
 
-@pytest.mark.asyncio
-async def test_rate_limit_blocks_second_call_then_allows_after_window():
+async def test_rate_limit_blocks_second_call_then_allows_after_window(monkeypatch):
+    clock = {"t": 1000.0}
+    monkeypatch.setattr(mw_mod, "_now", lambda: clock["t"])
     mw = RateLimitMiddleware(max_calls=1, per_seconds=0.05)
 
     async def handler(ev, data):
@@ -57,10 +43,9 @@ async def test_rate_limit_blocks_second_call_then_allows_after_window():
 
     # second should be rate limited
     res2 = await mw(handler, msg, {})
-    await asyncio.sleep(0)  # allow async answer scheduling
     assert res2 is None
 
-    # wait for window then allowed again
-    await asyncio.sleep(0.06)
+    # advance past the window then allowed again
+    clock["t"] += 0.06
     res3 = await mw(handler, msg, {})
     assert res3 == "ok"
\ No newline at end of file
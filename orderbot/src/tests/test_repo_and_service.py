@@ -1,22 +1,18 @@
-import os
-import pytest
+from datetime import datetime, timedelta, UTC
 
-from ..core.db import init_engine, get_session
-from ..services import order_service
+from sqlalchemy import create_engine, event, inspect
 
+from ..core import repo
+from ..core.db import Base, _upgrade_schema, get_session, get_readonly_session, health_check
+from ..core.models import OrderStatus
+from ..services import order_service
 
-@pytest.mark.asyncio
-async def test_create_and_get_orders(tmp_path):
-    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp_path}/test3.db"
-    await init_engine(os.environ["DATABASE_URL"])  # create tables
 
-    # create two orders by same user
+async def test_create_and_get_orders(db):
+    # create two orders by same user, claim one by other user
     async with get_session() as session:
         o1 = await order_service.create_order(session, title="A", content="a", amount=None, created_by=111, created_by_username="a1")
         o2 = await order_service.create_order(session, title="B", content="b", amount=20.0, created_by=111, created_by_username="a1")
-
-    # claim one by other user
-    async with get_session() as session:
         await order_service.claim_order(session, o1.id, 222, "op222")
 
     # fetch related
@@ -26,3 +22,115 @@ async def test_create_and_get_orders(tmp_path):
 
     assert len(mine) == 2
     assert len(theirs) == 1
+
+
+async def test_health_check_uses_initialized_engine(engine):
+    assert await health_check() is True
+
+
+async def test_update_order_fields_refreshes_loaded_instance(db):
+    async with get_session() as session:
+        order = await order_service.create_order_draft(session, title="T", content="c", amount=None, created_by=1, created_by_username=None)
+
+    async with get_session() as session:
+        loaded = await repo.get_order_by_id(session, order.id)
+        updated = await repo.update_order_fields(session, order.id, status=OrderStatus.NEW, claimed_by=9)
+        assert updated is loaded
+        assert loaded.status == OrderStatus.NEW
+        assert loaded.claimed_by == 9
+
+
+async def test_readonly_session_never_commits(db):
+    async with get_session() as session:
+        order = await order_service.create_order_draft(session, title="R", content="c", amount=None, created_by=1, created_by_username=None)
+
+    async with get_readonly_session() as session:
+        loaded = await repo.get_order_by_id(session, order.id)
+        assert loaded is not None
+        loaded.title = "changed"
+
+    async with get_readonly_session() as session:
+        assert (await repo.get_order_by_id(session, order.id)).title == "R"
+
+
+async def test_create_order_publishes_after_commit(db, monkeypatch):
+    published = []
+
+    async def fake_publish(order):
+        published.append(order.id)
+        return 4242
+
+    monkeypatch.setattr(order_service, "publish_order_to_channel", fake_publish)
+
+    async with get_session() as session:
+        order = await order_service.create_order(session, title="P", content="p", amount=None, created_by=1, created_by_username=None)
+        assert published == []  # nothing is sent before the transaction commits
+
+    await order_service.drain_background_publishes()
+    async with get_session() as session:
+        stored = await repo.get_order_by_id(session, order.id)
+    assert published == [order.id]
+    assert stored.channel_message_id == 4242
+
+
+async def test_user_related_orders_can_eager_load_histories(db):
+    async with get_session() as session:
+        await order_service.create_order_draft(session, title="H", content="h", amount=None, created_by=555, created_by_username=None)
+
+    async with get_session() as session:
+        orders = await repo.get_user_related_orders(session, 555, with_histories=True)
+        assert [len(o.histories) for o in orders] == [1]
+
+
+async def test_get_order_by_id_reuses_identity_map(db):
+    async with get_session() as session:
+        order = await order_service.create_order_draft(session, title="I", content="i", amount=None, created_by=1, created_by_username=None)
+
+    statements: list[str] = []
+    event.listen(db.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    async with get_session() as session:
+        first = await repo.get_order_by_id(session, order.id)
+        second = await repo.get_order_by_id(session, order.id)
+        assert first is second
+    assert sum(s.lstrip().upper().startswith("SELECT") for s in statements) == 1
+
+
+async def test_orders_by_user_and_date_range_has_no_duplicates(db):
+    async with get_session() as session:
+        own = await order_service.create_order_draft(session, title="A", content="a", amount=None, created_by=7, created_by_username=None)
+        other = await order_service.create_order_draft(session, title="B", content="b", amount=None, created_by=8, created_by_username=None)
+        await repo.update_order_fields(session, own.id, status=OrderStatus.NEW, claimed_by=7)
+        await repo.update_order_fields(session, other.id, status=OrderStatus.NEW, claimed_by=7)
+
+    now = datetime.now(UTC)
+    async with get_session() as session:
+        orders = await order_service.get_orders_by_user_and_date_range(session, 7, now - timedelta(days=1), now + timedelta(days=1))
+        assert sorted(o.id for o in orders) == sorted([own.id, other.id])
+
+
+async def test_summarize_orders_by_user_and_date_range(db):
+    async with get_session() as session:
+        await order_service.create_order_draft(session, title="A", content="a", amount=10, created_by=9001, created_by_username=None)
+        await order_service.create_order_draft(session, title="B", content="b", amount=None, created_by=9001, created_by_username=None)
+
+    now = datetime.now(UTC)
+    async with get_session() as session:
+        summary = await order_service.summarize_orders_by_user_and_date_range(session, 9001, now - timedelta(days=1), now + timedelta(days=1))
+    assert summary == {"count": 2, "amount": 10, "by_status": {"DRAFT": {"count": 2, "amount": 10}}}
+
+
+def test_upgrade_schema_replaces_old_single_column_indexes():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        # 模拟旧版本建的库：只有 created_by / claimed_by 单列索引
+        Base.metadata.create_all(conn)
+        conn.exec_driver_sql("DROP INDEX ix_orders_creator_updated")
+        conn.exec_driver_sql("DROP INDEX ix_orders_claimer_updated")
+        conn.exec_driver_sql("CREATE INDEX ix_orders_created_by ON orders (created_by)")
+        conn.exec_driver_sql("CREATE INDEX ix_orders_claimed_by ON orders (claimed_by)")
+
+        _upgrade_schema(conn)
+        _upgrade_schema(conn)  # 重复执行无副作用
+
+        names = {index["name"] for index in inspect(conn).get_indexes("orders")}
+    assert names == {"ix_orders_status", "ix_orders_creator_updated", "ix_orders_claimer_updated"}
@@ -1,17 +1,13 @@
 import asyncio
-import os
 import pytest
 
 from orderbot.src.core.models import OrderStatus
-from orderbot.src.core.db import init_engine, get_session
+from orderbot.src.core import repo
+from orderbot.src.core.db import get_session
 from orderbot.src.services import order_service
 
 
-@pytest.mark.asyncio
-async def test_order_state_transitions(tmp_path, monkeypatch):
-    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp_path}/test.db"
-    await init_engine(os.environ["DATABASE_URL"])  # create tables
-
+async def test_order_state_transitions(db, monkeypatch):
     # create order
     async with get_session() as session:
         order = await order_service.create_order(
@@ -38,11 +34,7 @@ async def test_order_state_transitions(tmp_path, monkeypatch):
         assert order.status == OrderStatus.DONE
 
 
-@pytest.mark.asyncio
-async def test_invalid_transition(tmp_path, monkeypatch):
-    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp_path}/test2.db"
-    await init_engine(os.environ["DATABASE_URL"])  # create tables
-
+async def test_invalid_transition(db, monkeypatch):
     async with get_session() as session:
         order = await order_service.create_order(
             session,
@@ -57,3 +49,45 @@ async def test_invalid_transition(tmp_path, monkeypatch):
     async with get_session() as session:
         with pytest.raises(order_service.BusinessError):
             await order_service.update_status(session, order.id, OrderStatus.DONE, 1)
+
+
+async def test_second_claim_is_rejected(db):
+    async with get_session() as session:
+        order = await order_service.create_order(session, title="t", content="c", amount=None, created_by=1, created_by_username=None)
+
+    async with get_session() as session:
+        await order_service.claim_order(session, order.id, 2, "op2")
+
+    async with get_session() as session:
+        with pytest.raises(order_service.BusinessError, match="only_NEW_can_be_claimed"):
+            await order_service.claim_order(session, order.id, 3, "op3")
+        with pytest.raises(order_service.BusinessError, match="order_not_found"):
+            await order_service.claim_order(session, order.id + 1000, 3, "op3")
+
+
+@pytest.mark.parametrize("returning", [True, False], ids=["update_returning", "no_returning"])
+async def test_concurrent_claims_only_one_wins(db, monkeypatch, returning):
+    if not returning:
+        monkeypatch.setattr(repo, "_supports_update_returning", lambda session: False)
+    async with get_session() as session:
+        order = await order_service.create_order(session, title="t", content="c", amount=None, created_by=1, created_by_username=None)
+
+    # 两个会话都先读到 NEW，再同时认领：状态检查与写入是同一条 UPDATE，只能有一方成功
+    both_loaded = asyncio.Barrier(2)
+
+    async def claim(session, user_id):
+        assert (await repo.get_order_by_id(session, order.id)).status == OrderStatus.NEW
+        await both_loaded.wait()
+        return await repo.transition_order(
+            session, order.id, from_status=OrderStatus.NEW, to_status=OrderStatus.CLAIMED, claimed_by=user_id
+        )
+
+    async with get_session() as first, get_session() as second:
+        results = await asyncio.gather(claim(first, 2), claim(second, 3))
+
+    winners = [r for r in results if r is not None]
+    assert len(winners) == 1
+    assert winners[0].status == OrderStatus.CLAIMED
+    async with get_session() as session:
+        stored = await repo.get_order_by_id(session, order.id)
+    assert stored.claimed_by == winners[0].claimed_by
@@ -0,0 +1,56 @@
+import pytest
+
+from ..utils import telegram_api
+from ..utils.telegram_api import get_me, TelegramApiError
+
+
+class DummyResponse:
+    def __init__(self, status: int, payload: dict):
+        self.status = status
+        self._payload = payload
+
+    async def json(self):
+        return self._payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class DummySession:
+    def __init__(self, status: int = 200, payload: dict | None = None):
+        self.status = status
+        self.payload = payload if payload is not None else {"ok": True, "result": {"username": "didi_bot"}}
+        self.urls: list[str] = []
+
+    def get(self, url, **_):
+        self.urls.append(url)
+        return DummyResponse(self.status, self.payload)
+
+
+async def test_get_me_caches_successful_result_per_token():
+    telegram_api.clear_me_cache()
+    session = DummySession()
+
+    me1 = await get_me("1:aaa", session=session)
+    me2 = await get_me("1:aaa", session=session)
+    await get_me("2:bbb", session=session)
+
+    assert me1 == me2 == {"username": "didi_bot"}
+    assert len(session.urls) == 2  # second call for the same token is served from cache
+
+
+async def test_get_me_raises_and_does_not_cache_failures():
+    telegram_api.clear_me_cache()
+    session = DummySession(status=401, payload={"ok": False, "description": "Unauthorized"})
+
+    with pytest.raises(TelegramApiError) as exc:
+        await get_me("1:bad", session=session)
+    assert exc.value.status == 401
+
+    with pytest.raises(TelegramApiError):
+        await get_me("1:bad", session=session)
+    assert len(session.urls) == 2
+
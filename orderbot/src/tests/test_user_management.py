@@ -1,21 +1,23 @@
+import asyncio
 import pytest
 import os
-import tempfile
-from unittest.mock import AsyncMock, patch, mock_open
+from unittest.mock import AsyncMock, patch
 from aiogram.exceptions import TelegramBadRequest
 
 from ..services.user_management import UserManagementService
 from ..config import Settings
 
+# 模块级复用同一个异常实例，side_effect 每次抛出它即可
+_TG_NOT_FOUND = TelegramBadRequest(method="get_chat", message="User not found")
+
 
 class TestUserManagementService:
     """用户管理服务测试"""
     
     @pytest.fixture
-    def mock_settings(self, monkeypatch):
-        """创建模拟的设置对象"""
-        monkeypatch.setenv("ALLOWED_USER_IDS", "123,456")
-        return Settings()
+    def mock_settings(self):
+        """创建模拟的设置对象（字段直接传入，不经环境变量）"""
+        return Settings(ALLOWED_USER_IDS="123,456")
     
     @pytest.fixture
     def user_mgmt(self, mock_settings):
@@ -36,30 +38,36 @@ class TestUserManagementService:
         users = user_mgmt.get_whitelist_users()
         assert users == {123, 456}
     
-    @pytest.mark.asyncio
-    async def test_add_user_to_whitelist_new_user(self, user_mgmt, monkeypatch):
+    async def test_add_user_to_whitelist_new_user(self, user_mgmt, tmp_path, monkeypatch):
         """测试添加新用户到白名单"""
-        # 模拟文件操作
-        mock_file_content = 'ALLOWED_USER_IDS="123,456"\n'
-        
-        with patch("builtins.open", mock_open(read_data=mock_file_content)) as mock_file:
-            with patch.dict(os.environ, {"ALLOWED_USER_IDS": "123,456"}):
-                # 重新创建 settings 以反映环境变量
-                user_mgmt.settings = Settings()
-                
-                result = await user_mgmt.add_user_to_whitelist(789)
-                
-                assert result is True
-                # 验证文件写入被调用
-                mock_file.assert_called()
+        # 在临时目录中操作真实的 .env 文件
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / ".env").write_text('ALLOWED_USER_IDS="123,456"\n', encoding="utf-8")
+        
+        with patch.dict(os.environ, {"ALLOWED_USER_IDS": "123,456"}):
+            result = await user_mgmt.add_user_to_whitelist(789)
+            
+            assert result is True
+            # 验证文件已写入
+            assert 'ALLOWED_USER_IDS="123,456,789"' in (tmp_path / ".env").read_text(encoding="utf-8")
+    
+    async def test_concurrent_whitelist_updates_are_not_lost(self, user_mgmt, tmp_path, monkeypatch):
+        """测试并发添加时不会互相覆盖"""
+        monkeypatch.chdir(tmp_path)
+        
+        with patch.dict(os.environ, {"ALLOWED_USER_IDS": "123,456"}):
+            other = UserManagementService(user_mgmt.settings)
+            results = await asyncio.gather(user_mgmt.add_user_to_whitelist(789), user_mgmt.add_user_to_whitelist(790))
+            
+            assert results == [True, True]
+            assert user_mgmt.get_whitelist_users() == {123, 456, 789, 790}
+            assert other.is_admin(790) is True  # 共享同一 settings 实例的其他服务立即可见
     
-    @pytest.mark.asyncio
     async def test_add_user_to_whitelist_existing_user(self, user_mgmt):
         """测试添加已存在的用户到白名单"""
         result = await user_mgmt.add_user_to_whitelist(123)
         assert result is False
     
-    @pytest.mark.asyncio
     async def test_resolve_username_to_id_success(self, user_mgmt):
         """测试成功解析用户名到用户ID"""
         mock_bot = AsyncMock()
@@ -72,18 +80,16 @@ class TestUserManagementService:
         assert result == 12345
         mock_bot.get_chat.assert_called_once_with("@testuser")
     
-    @pytest.mark.asyncio
     async def test_resolve_username_to_id_not_found(self, user_mgmt):
         """测试解析不存在的用户名"""
         mock_bot = AsyncMock()
-        mock_bot.get_chat.side_effect = TelegramBadRequest(method="get_chat", message="User not found")
+        mock_bot.get_chat.side_effect = _TG_NOT_FOUND
         
         result = await user_mgmt.resolve_username_to_id(mock_bot, "@nonexistent")
         
         assert result is None
         mock_bot.get_chat.assert_called_once_with("@nonexistent")
     
-    @pytest.mark.asyncio
     async def test_resolve_username_to_id_without_at_symbol(self, user_mgmt):
         """测试解析不带@符号的用户名"""
         mock_bot = AsyncMock()
@@ -96,41 +102,45 @@ class TestUserManagementService:
         assert result == 54321
         mock_bot.get_chat.assert_called_once_with("@testuser")
     
-    @pytest.mark.asyncio
-    async def test_update_env_file_existing_key(self, user_mgmt):
+    async def test_update_env_file_existing_key(self, user_mgmt, tmp_path, monkeypatch):
         """测试更新现有环境变量键"""
-        mock_content = 'BOT_TOKEN="test"\nALLOWED_USER_IDS="123,456"\nOTHER_VAR="value"\n'
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / ".env").write_text('BOT_TOKEN="test"\nALLOWED_USER_IDS="123,456"\nOTHER_VAR="value"\n', encoding="utf-8")
         expected_content = 'BOT_TOKEN="test"\nALLOWED_USER_IDS="123,456,789"\nOTHER_VAR="value"\n'
         
-        with patch("builtins.open", mock_open(read_data=mock_content)) as mock_file:
-            await user_mgmt._update_env_file("ALLOWED_USER_IDS", "123,456,789")
-            
-            # 验证文件被正确写入
-            handle = mock_file()
-            written_content = "".join(call.args[0] for call in handle.write.call_args_list)
-            assert "ALLOWED_USER_IDS=\"123,456,789\"" in written_content
+        await user_mgmt._update_env_file("ALLOWED_USER_IDS", "123,456,789")
+        
+        # 验证文件被正确写入
+        assert (tmp_path / ".env").read_text(encoding="utf-8") == expected_content
     
-    @pytest.mark.asyncio
-    async def test_update_env_file_new_key(self, user_mgmt):
+    async def test_update_env_file_new_key(self, user_mgmt, tmp_path, monkeypatch):
         """测试添加新的环境变量键"""
-        mock_content = 'BOT_TOKEN="test"\n'
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / ".env").write_text('BOT_TOKEN="test"\n', encoding="utf-8")
         
-        with patch("builtins.open", mock_open(read_data=mock_content)) as mock_file:
-            await user_mgmt._update_env_file("NEW_VAR", "new_value")
-            
-            # 验证新键被添加
-            handle = mock_file()
-            written_content = "".join(call.args[0] for call in handle.write.call_args_list)
-            assert 'NEW_VAR="new_value"' in written_content
+        await user_mgmt._update_env_file("NEW_VAR", "new_value")
+        
+        # 验证新键被添加
+        assert 'NEW_VAR="new_value"' in (tmp_path / ".env").read_text(encoding="utf-8")
     
-    @pytest.mark.asyncio
-    async def test_update_env_file_nonexistent_file(self, user_mgmt):
+    async def test_update_env_file_nonexistent_file(self, user_mgmt, tmp_path, monkeypatch):
         """测试更新不存在的环境变量文件"""
-        with patch("builtins.open", mock_open()) as mock_file:
-            # 模拟文件不存在的情况
-            mock_file.side_effect = [FileNotFoundError(), mock_open().return_value]
-            
-            await user_mgmt._update_env_file("NEW_VAR", "new_value")
-            
-            # 验证文件被创建并写入
-            assert mock_file.call_count >= 1
\ No newline at end of file
+        monkeypatch.chdir(tmp_path)
+        
+        await user_mgmt._update_env_file("NEW_VAR", "new_value")
+        
+        # 验证文件被创建并写入
+        assert (tmp_path / ".env").read_text(encoding="utf-8") == 'NEW_VAR="new_value"\n'
+    
+    async def test_update_env_file_replaces_atomically_and_keeps_mode(self, user_mgmt, tmp_path, monkeypatch):
+        """测试通过临时文件替换写入，且保留原文件权限"""
+        monkeypatch.chdir(tmp_path)
+        env_file = tmp_path / ".env"
+        env_file.write_text('BOT_TOKEN="test"\n', encoding="utf-8")
+        env_file.chmod(0o600)
+        
+        await user_mgmt._update_env_file("NEW_VAR", "new_value")
+        
+        assert env_file.read_text(encoding="utf-8") == 'BOT_TOKEN="test"\nNEW_VAR="new_value"\n'
+        assert env_file.stat().st_mode & 0o777 == 0o600
+        assert not (tmp_path / ".env.tmp").exists()
@@ -9,7 +9,7 @@ from aiogram.fsm.context import FSMContext
 import os
 import aiofiles
 
-from ..config import Settings
+from ..config import get_settings
 from ..core.db import get_session, init_engine
 from ..core.models import OrderStatus
 from ..services import order_service
@@ -21,7 +21,17 @@ from .fsm import OrderCreationFlow
 from .keyboards import get_main_keyboard, get_order_list_keyboard, get_stats_keyboard, get_admin_list_keyboard, get_back_keyboard
 
 
-settings = Settings()
+settings = get_settings()
+
+# 订单列表中各状态对应的图标
+_STATUS_EMOJI = {
+    OrderStatus.DRAFT: "📄",
+    OrderStatus.NEW: "📝",
+    OrderStatus.CLAIMED: "📢",
+    OrderStatus.IN_PROGRESS: "🔄",
+    OrderStatus.DONE: "✅",
+    OrderStatus.CANCELED: "❌",
+}
 
 # 图片存储目录
 IMAGE_DIR = "/app/images"
@@ -151,14 +161,7 @@ async def handle_order_list_button(msg: Message, state: FSMContext) -> None:
             # 构建订单列表消息
             order_text = "📋 您的订单列表：\n\n"
             for order in orders[:10]:  # 最多显示10个订单
-                status_emoji = {
-                    OrderStatus.DRAFT: "📄",
-                    OrderStatus.NEW: "📝",
-                    OrderStatus.CLAIMED: "📢",
-                    OrderStatus.IN_PROGRESS: "🔄",
-                    OrderStatus.DONE: "✅",
-                    OrderStatus.CANCELED: "❌"
-                }.get(order.status, "❓")
+                status_emoji = _STATUS_EMOJI.get(order.status, "❓")
                 
                 order_text += f"{status_emoji} #{order.id} {order.title}\n"
                 order_text += f"   💰 {order.amount}元 | {order.status.value}\n"
@@ -240,14 +243,7 @@ async def handle_refresh_orders(callback: CallbackQuery) -> None:
             # 构建订单列表消息
             order_text = "📋 您的订单列表：\n\n"
             for order in orders[:10]:
-                status_emoji = {
-                    OrderStatus.DRAFT: "📄",
-                    OrderStatus.NEW: "📝",
-                    OrderStatus.CLAIMED: "📢",
-                    OrderStatus.IN_PROGRESS: "🔄",
-                    OrderStatus.DONE: "✅",
-                    OrderStatus.CANCELED: "❌"
-                }.get(order.status, "❓")
+                status_emoji = _STATUS_EMOJI.get(order.status, "❓")
                 
                 order_text += f"{status_emoji} #{order.id} {order.title}\n"
                 order_text += f"   💰 {order.amount}元 | {order.status.value}\n"
@@ -300,11 +296,11 @@ async def handle_stats_callback(callback: CallbackQuery) -> None:
                 return
             
             # 获取订单数据
-            orders = await order_service.get_orders_by_user_and_date_range(
+            summary = await order_service.summarize_orders_by_user_and_date_range(
                 session, user_id, start_date, now
             )
             
-            if not orders:
+            if not summary["count"]:
                 await callback.message.edit_text(
                     f"💰 {period_name}金额统计\n\n"
                     f"📊 暂无{period_name}订单数据",
@@ -313,23 +309,13 @@ async def handle_stats_callback(callback: CallbackQuery) -> None:
                 await callback.answer()
                 return
             
-            # 统计数据
-            total_amount = sum(order.amount for order in orders)
-            status_stats = {}
-            for order in orders:
-                status = order.status.value
-                if status not in status_stats:
-                    status_stats[status] = {"count": 0, "amount": 0}
-                status_stats[status]["count"] += 1
-                status_stats[status]["amount"] += order.amount
-            
             # 构建统计消息
             stats_text = f"💰 {period_name}金额统计\n\n"
-            stats_text += f"📊 总订单数：{len(orders)}\n"
-            stats_text += f"💵 总金额：{total_amount}元\n\n"
+            stats_text += f"📊 总订单数：{summary['count']}\n"
+            stats_text += f"💵 总金额：{summary['amount']}元\n\n"
             stats_text += "📈 按状态统计：\n"
             
-            for status, data in status_stats.items():
+            for status, data in summary["by_status"].items():
                 stats_text += f"   {status}：{data['count']}单，{data['amount']}元\n"
             
             await callback.message.edit_text(
@@ -496,7 +482,7 @@ async def on_photo(msg: Message, state: FSMContext) -> None:
 async def setup_bot(dp: Dispatcher) -> None:
     """设置机器人"""
     # 初始化数据库
-    await init_engine(settings.DATABASE_URL)
+    await init_engine(settings.DATABASE_URL, pgbouncer=settings.PGBOUNCER)
     
     # 启动网络健康检查器
     await network_health_checker.start()
@@ -516,6 +502,9 @@ async def shutdown_bot() -> None:
     # 停止网络健康检查器
     await network_health_checker.stop()
     
+    # 等待后台频道发布回写 channel_message_id 后再关闭数据库
+    await order_service.drain_background_publishes()
+    
     # 关闭数据库连接
     from ..core.db import close_engine
     await close_engine()
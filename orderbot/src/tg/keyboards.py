@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
+from functools import lru_cache
 from typing import List
 
 from ..core.models import OrderStatus
@@ -40,7 +41,9 @@ ADMIN_LIST_VIEW_CB = "admin_list_view"
 CONFIRM_CB = "confirm_{action}"
 CANCEL_ACTION_CB = "cancel_action"
 
+# 下列菜单键盘只取决于常量或单个参数，构建一次后缓存复用；发送时 aiogram 不修改 markup，共享同一对象是安全的
 
+@lru_cache(maxsize=1)
 def get_main_keyboard() -> ReplyKeyboardMarkup:
     """获取主菜单键盘"""
     builder = ReplyKeyboardBuilder()
@@ -63,6 +66,7 @@ def get_main_keyboard() -> ReplyKeyboardMarkup:
     )
 
 
+@lru_cache(maxsize=4)
 def get_order_list_keyboard(has_orders: bool = True) -> InlineKeyboardMarkup:
     """获取订单列表操作键盘"""
     builder = InlineKeyboardBuilder()
@@ -77,6 +81,7 @@ def get_order_list_keyboard(has_orders: bool = True) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def get_stats_keyboard() -> InlineKeyboardMarkup:
     """获取金额统计键盘"""
     builder = InlineKeyboardBuilder()
@@ -91,6 +96,7 @@ def get_stats_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def get_admin_list_keyboard() -> InlineKeyboardMarkup:
     """获取管理员列表键盘"""
     builder = InlineKeyboardBuilder()
@@ -104,6 +110,7 @@ def get_admin_list_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=32)
 def get_confirm_keyboard(action: str) -> InlineKeyboardMarkup:
     """获取确认操作键盘"""
     builder = InlineKeyboardBuilder()
@@ -115,6 +122,7 @@ def get_confirm_keyboard(action: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def get_back_keyboard() -> InlineKeyboardMarkup:
     """获取返回键盘"""
     builder = InlineKeyboardBuilder()
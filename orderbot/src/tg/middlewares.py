@@ -2,17 +2,27 @@ from __future__ import annotations
 
 import asyncio
 import time
-from typing import Any, Awaitable, Callable, Dict, Optional, Set, TypeVar
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
 
 from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
 
-from ..config import Settings
+from ..config import Settings, get_settings
 from ..utils.logging import log_error, log_info
 from ..utils.network import network_monitor, retry_with_backoff, default_retry_config
 
 Event = TypeVar("Event")
 Handler = Callable[[Event, Dict[str, Any]], Awaitable[Any]]
 
+# 限流计时使用的时钟，测试中可替换为可手动推进的假时钟
+_now = time.monotonic
+
+# 中间件回复给用户的提示文案（测试按相等断言）
+MSG_DENIED = "您没有权限执行此操作。"
+MSG_DENIED_ALERT = "无权操作"
+MSG_RATE_LIMITED = "操作过于频繁，请稍后再试"
+MSG_NETWORK_ERROR = "网络连接异常，请稍后重试"
+MSG_INTERNAL_ERROR = "发生错误，请稍后再试"
+
 
 def _extract_user_id(event: Any) -> Optional[int]:
     user = getattr(event, "from_user", None)
@@ -21,16 +31,17 @@ def _extract_user_id(event: Any) -> Optional[int]:
     return getattr(user, "id", None)
 
 
-def _safe_answer(event: Any, text: str, *, prefer_alert: bool = False) -> None:
+async def _safe_answer(event: Any, text: str, *, prefer_alert: bool = False) -> None:
+    # 直接 await 回复，不再 create_task：避免游离任务被回收或异常无人处理
     ans = getattr(event, "answer", None)
     if ans is None or not callable(ans):
         return
     try:
         if prefer_alert:
             # Try show_alert if supported (CallbackQuery-compatible)
-            asyncio.create_task(ans(text, show_alert=True))  # type: ignore[misc]
+            await ans(text, show_alert=True)  # type: ignore[misc]
             return None
-        asyncio.create_task(ans(text))  # type: ignore[misc]
+        await ans(text)  # type: ignore[misc]
         return None
     except Exception:  # noqa: BLE001
         return None
@@ -44,19 +55,20 @@ class WhitelistMiddleware:
     """
 
     def __init__(self, settings: Optional[Settings] = None) -> None:
-        self.settings = settings or Settings()
-        self._allowed: Set[int] = self.settings.allowed_user_ids()
+        self.settings = settings or get_settings()
 
     async def __call__(self, handler: Handler, event: Event, data: Dict[str, Any]) -> Any:  # type: ignore[override]
         user_id = _extract_user_id(event)
+        # allowed_user_ids() is a pre-parsed frozenset kept in sync by set_allowed_user_ids, so read it per call
+        allowed = self.settings.allowed_user_ids()
 
-        if not self._allowed:
+        if not allowed:
             return await handler(event, data)
 
-        if user_id is None or user_id not in self._allowed:
+        if user_id is None or user_id not in allowed:
             # deny politely
             prefer_alert = hasattr(event, "data")
-            _safe_answer(event, "您没有权限执行此操作。" if not prefer_alert else "无权操作", prefer_alert=prefer_alert)
+            await _safe_answer(event, MSG_DENIED if not prefer_alert else MSG_DENIED_ALERT, prefer_alert=prefer_alert)
             log_info("auth.denied", actor_tg_user_id=user_id)
             return None
         return await handler(event, data)
@@ -111,13 +123,16 @@ class RateLimitMiddleware:
         if not k:
             return await handler(event, data)
         async with self._lock:
-            now = time.monotonic()
+            now = _now()
             last = self._last.get(k, 0.0)
-            if now - last < self.min_interval:
-                _safe_answer(event, "操作过于频繁，请稍后再试", prefer_alert=(k[0] == "cb"))
-                log_info("ratelimit.block", key=k[0], actor_tg_user_id=k[1])
-                return None
-            self._last[k] = now
+            blocked = now - last < self.min_interval
+            if not blocked:
+                self._last[k] = now
+        if blocked:
+            # 在锁外回复，网络往返不阻塞其他用户的限流判断
+            await _safe_answer(event, MSG_RATE_LIMITED, prefer_alert=(k[0] == "cb"))
+            log_info("ratelimit.block", key=k[0], actor_tg_user_id=k[1])
+            return None
         return await handler(event, data)
 
 
@@ -138,10 +153,10 @@ class ErrorHandlingMiddleware:
             actor_id = _extract_user_id(event)
             log_error("handler.network_error", error=str(e), actor_tg_user_id=actor_id)
             network_monitor.record_failure()
-            _safe_answer(event, "网络连接异常，请稍后重试", prefer_alert=hasattr(event, "data"))
+            await _safe_answer(event, MSG_NETWORK_ERROR, prefer_alert=hasattr(event, "data"))
             return None
         except Exception as e:  # noqa: BLE001
             actor_id = _extract_user_id(event)
             log_error("handler.error", error=str(e), actor_tg_user_id=actor_id)
-            _safe_answer(event, "发生错误，请稍后再试", prefer_alert=hasattr(event, "data"))
+            await _safe_answer(event, MSG_INTERNAL_ERROR, prefer_alert=hasattr(event, "data"))
             return None
\ No newline at end of file
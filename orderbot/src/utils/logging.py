@@ -18,13 +18,17 @@ def _kv(**kwargs: Any) -> str:
         return str(kwargs)
 
 
+# 级别未开启时直接返回，跳过 kwargs 的 JSON 序列化
 def log_info(event: str, **kwargs: Any) -> None:
-    logger.info("%s %s", event, _kv(**kwargs))
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("%s %s", event, _kv(**kwargs))
 
 
 def log_error(event: str, **kwargs: Any) -> None:
-    logger.error("%s %s", event, _kv(**kwargs))
+    if logger.isEnabledFor(logging.ERROR):
+        logger.error("%s %s", event, _kv(**kwargs))
 
 
 def log_warn(event: str, **kwargs: Any) -> None:
-    logger.warning("%s %s", event, _kv(**kwargs))
+    if logger.isEnabledFor(logging.WARNING):
+        logger.warning("%s %s", event, _kv(**kwargs))
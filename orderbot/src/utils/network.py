@@ -27,7 +27,7 @@ class NetworkMonitor:
         self.connection_failures += 1
         self.last_failure_time = current_time
         
-        logger.warning(f"网络连接失败，当前失败次数: {self.connection_failures}")
+        logger.warning("网络连接失败，当前失败次数: %s", self.connection_failures)
         
     def record_success(self):
         """记录网络成功"""
@@ -124,7 +124,7 @@ async def retry_with_backoff(
                 )
                 await asyncio.sleep(delay)
             else:
-                logger.error(f"网络操作最终失败，已达到最大重试次数: {e}")
+                logger.error("网络操作最终失败，已达到最大重试次数: %s", e)
                 
         except TelegramRetryAfter as e:
             # Telegram API 限流
@@ -136,37 +136,44 @@ async def retry_with_backoff(
                 )
                 await asyncio.sleep(delay)
             else:
-                logger.error(f"Telegram API 限流，已达到最大重试次数")
+                logger.error("Telegram API 限流，已达到最大重试次数")
                 last_exception = e
                 
         except Exception as e:
             # 其他异常不重试
-            logger.error(f"非网络异常，不进行重试: {e}")
+            logger.error("非网络异常，不进行重试: %s", e)
             last_exception = e
             break
             
     raise last_exception
 
-async def check_network_connectivity(timeout: float = 10.0) -> bool:
-    """检查网络连接性"""
+async def check_network_connectivity(timeout: float = 10.0, session: Optional[ClientSession] = None) -> bool:
+    """检查网络连接性
+
+    传入 `session` 时复用调用方的连接池（不会关闭它），否则临时创建一个会话。
+    """
+    if session is None:
+        async with ClientSession(timeout=ClientTimeout(total=timeout)) as own_session:
+            return await _probe_urls(own_session, ClientTimeout(total=timeout))
+    return await _probe_urls(session, ClientTimeout(total=timeout))
+
+
+async def _probe_urls(session: ClientSession, timeout_config: ClientTimeout) -> bool:
     test_urls = [
         "https://api.telegram.org",
         "https://www.google.com",
         "https://www.baidu.com"
     ]
     
-    timeout_config = ClientTimeout(total=timeout)
-    
-    async with ClientSession(timeout=timeout_config) as session:
-        for url in test_urls:
-            try:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        logger.debug(f"网络连接正常: {url}")
-                        return True
-            except Exception as e:
-                logger.debug(f"无法连接到 {url}: {e}")
-                continue
+    for url in test_urls:
+        try:
+            async with session.get(url, timeout=timeout_config) as response:
+                if response.status == 200:
+                    logger.debug("网络连接正常: %s", url)
+                    return True
+        except Exception as e:
+            logger.debug("无法连接到 %s: %s", url, e)
+            continue
                 
     logger.warning("所有网络连接测试都失败")
     return False
@@ -224,7 +231,7 @@ class NetworkHealthChecker:
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"网络健康检查异常: {e}")
+                logger.error("网络健康检查异常: %s", e)
                 await asyncio.sleep(self.check_interval)
                 
     def get_status(self) -> dict:
@@ -85,6 +85,8 @@ class ProcessMonitor:
         self._monitor_task: Optional[asyncio.Task] = None
         self._health_callbacks: Dict[str, Callable] = {}
         self._alert_callbacks: List[Callable] = []
+        # 进程名 -> psutil.Process 句柄；复用同一句柄 cpu_percent() 才能得到两次检查间的增量
+        self._handles: Dict[str, psutil.Process] = {}
         
         # 设置日志
         if self.config.log_file:
@@ -106,7 +108,15 @@ class ProcessMonitor:
         if health_check:
             self._health_callbacks[name] = health_check
             
-        logger.info(f"已注册进程监控: {name}")
+        logger.info("已注册进程监控: %s", name)
+    
+    def _get_handle(self, name: str, pid: int) -> psutil.Process:
+        """获取进程句柄，PID 变化（重启）后重新创建"""
+        handle = self._handles.get(name)
+        if handle is None or handle.pid != pid:
+            handle = psutil.Process(pid)
+            self._handles[name] = handle
+        return handle
     
     def add_alert_callback(self, callback: Callable) -> None:
         """添加告警回调"""
@@ -138,13 +148,13 @@ class ProcessMonitor:
     async def start_process(self, name: str) -> bool:
         """启动进程"""
         if name not in self.processes:
-            logger.error(f"未找到进程配置: {name}")
+            logger.error("未找到进程配置: %s", name)
             return False
             
         process_info = self.processes[name]
         
         if process_info.state == ProcessState.RUNNING:
-            logger.warning(f"进程 {name} 已在运行")
+            logger.warning("进程 %s 已在运行", name)
             return True
             
         try:
@@ -159,59 +169,61 @@ class ProcessMonitor:
             process_info.state = ProcessState.RUNNING
             process_info.start_time = datetime.now()
             
-            logger.info(f"进程 {name} 已启动，PID: {proc.pid}")
+            logger.info("进程 %s 已启动，PID: %s", name, proc.pid)
             return True
             
         except Exception as e:
-            logger.error(f"启动进程 {name} 失败: {e}")
+            logger.error("启动进程 %s 失败: %s", name, e)
             process_info.state = ProcessState.FAILED
             return False
     
     async def stop_process(self, name: str, force: bool = False) -> bool:
         """停止进程"""
         if name not in self.processes:
-            logger.error(f"未找到进程配置: {name}")
+            logger.error("未找到进程配置: %s", name)
             return False
             
         process_info = self.processes[name]
         
         if not process_info.pid:
-            logger.warning(f"进程 {name} 未运行")
+            logger.warning("进程 %s 未运行", name)
             return True
             
         try:
-            process = psutil.Process(process_info.pid)
+            process = self._get_handle(name, process_info.pid)
             
             if force:
                 process.kill()
-                logger.info(f"强制终止进程 {name}")
+                logger.info("强制终止进程 %s", name)
             else:
                 process.terminate()
-                logger.info(f"正常终止进程 {name}")
+                logger.info("正常终止进程 %s", name)
                 
                 # 等待进程结束
                 try:
                     process.wait(timeout=10)
                 except psutil.TimeoutExpired:
-                    logger.warning(f"进程 {name} 未在10秒内结束，强制终止")
+                    logger.warning("进程 %s 未在10秒内结束，强制终止", name)
                     process.kill()
             
             process_info.pid = None
             process_info.state = ProcessState.STOPPED
+            self._handles.pop(name, None)
             return True
             
         except psutil.NoSuchProcess:
-            logger.info(f"进程 {name} 已不存在")
+            logger.info("进程 %s 已不存在", name)
+            self._handles.pop(name, None)
             process_info.pid = None
             process_info.state = ProcessState.STOPPED
             return True
         except Exception as e:
-            logger.error(f"停止进程 {name} 失败: {e}")
+            logger.error("停止进程 %s 失败: %s", name, e)
             return False
     
     async def restart_process(self, name: str) -> bool:
         """重启进程"""
-        logger.info(f"重启进程: {name}")
+        logger.info("重启进程: %s", name)
         
         # 停止进程
         await self.stop_process(name)
@@ -252,7 +264,7 @@ class ProcessMonitor:
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"监控循环异常: {e}")
+                logger.error("监控循环异常: %s", e)
                 await asyncio.sleep(self.config.check_interval)
     
     async def _check_processes(self) -> None:
@@ -266,13 +278,14 @@ class ProcessMonitor:
             # 检查进程是否存在
             if process_info.pid:
                 try:
-                    process = psutil.Process(process_info.pid)
+                    process = self._get_handle(name, process_info.pid)
                     
-                    # 更新资源使用情况
-                    process_info.cpu_percent = process.cpu_percent()
-                    memory_info = process.memory_info()
-                    process_info.memory_mb = memory_info.rss / 1024 / 1024
-                    process_info.memory_percent = process.memory_percent()
+                    # 更新资源使用情况（oneshot 内多个指标共用一次 /proc 读取）
+                    with process.oneshot():
+                        process_info.cpu_percent = process.cpu_percent()
+                        memory_info = process.memory_info()
+                        process_info.memory_mb = memory_info.rss / 1024 / 1024
+                        process_info.memory_percent = process.memory_percent()
                     
                     # 检查资源使用率
                     await self._check_resource_usage(name, process_info)
@@ -286,17 +299,18 @@ class ProcessMonitor:
                             )
                             
                             if not health_ok:
-                                logger.warning(f"进程 {name} 健康检查失败")
+                                logger.warning("进程 %s 健康检查失败", name)
                                 await self._handle_unhealthy_process(name, process_info)
                                 
                         except asyncio.TimeoutError:
-                            logger.warning(f"进程 {name} 健康检查超时")
+                            logger.warning("进程 %s 健康检查超时", name)
                             await self._handle_unhealthy_process(name, process_info)
                         except Exception as e:
-                            logger.error(f"进程 {name} 健康检查异常: {e}")
+                            logger.error("进程 %s 健康检查异常: %s", name, e)
                     
                 except psutil.NoSuchProcess:
-                    logger.warning(f"进程 {name} (PID: {process_info.pid}) 已停止")
+                    logger.warning("进程 %s (PID: %s) 已停止", name, process_info.pid)
+                    self._handles.pop(name, None)
                     process_info.pid = None
                     process_info.state = ProcessState.CRASHED
                     
@@ -310,7 +324,7 @@ class ProcessMonitor:
                     await self._handle_crashed_process(name, process_info)
                     
         except Exception as e:
-            logger.error(f"检查进程 {name} 时发生异常: {e}")
+            logger.error("检查进程 %s 时发生异常: %s", name, e)
     
     async def _check_resource_usage(self, name: str, process_info: ProcessInfo) -> None:
         """检查资源使用情况"""
@@ -330,12 +344,12 @@ class ProcessMonitor:
         """处理崩溃的进程"""
         # 检查重启次数限制
         if not self._can_restart(process_info):
-            logger.error(f"进程 {name} 重启次数超限，停止自动重启")
+            logger.error("进程 %s 重启次数超限，停止自动重启", name)
             process_info.state = ProcessState.FAILED
             await self._send_alert(f"进程 {name} 重启次数超限，已停止自动重启")
             return
         
-        logger.info(f"尝试重启崩溃的进程: {name}")
+        logger.info("尝试重启崩溃的进程: %s", name)
         process_info.state = ProcessState.RESTARTING
         
         success = await self.restart_process(name)
@@ -346,7 +360,7 @@ class ProcessMonitor:
     async def _handle_unhealthy_process(self, name: str, process_info: ProcessInfo) -> None:
         """处理不健康的进程"""
         if self.config.enable_auto_restart and self._can_restart(process_info):
-            logger.info(f"重启不健康的进程: {name}")
+            logger.info("重启不健康的进程: %s", name)
             await self.restart_process(name)
         else:
             await self._send_alert(f"进程 {name} 健康检查失败但未重启")
@@ -369,7 +383,7 @@ class ProcessMonitor:
     
     async def _send_alert(self, message: str) -> None:
         """发送告警"""
-        logger.warning(f"告警: {message}")
+        logger.warning("告警: %s", message)
         
         for callback in self._alert_callbacks:
             try:
@@ -378,7 +392,7 @@ class ProcessMonitor:
                 else:
                     callback(message)
             except Exception as e:
-                logger.error(f"发送告警失败: {e}")
+                logger.error("发送告警失败: %s", e)
 
 
 # 全局进程监控器实例
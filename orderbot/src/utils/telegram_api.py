@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from aiohttp import ClientSession, ClientTimeout
+
+TELEGRAM_API_BASE = "https://api.telegram.org"
+
+# token -> getMe 结果；只缓存成功响应，token 变化时自然失效
+_ME_CACHE: Dict[str, Dict[str, Any]] = {}
+
+
+class TelegramApiError(Exception):
+    """Telegram Bot API 返回非 ok 响应"""
+
+    def __init__(self, status: int, description: Optional[str] = None) -> None:
+        super().__init__(description or f"HTTP {status}")
+        self.status = status
+        self.description = description
+
+
+async def get_me(token: str, *, session: Optional[ClientSession] = None, timeout: float = 10.0) -> Dict[str, Any]:
+    """调用 getMe 并返回 `result` 字段，成功结果按 token 缓存。
+
+    check_config.py 与 healthcheck.py 共用此函数，避免对同一 token 重复发起请求。
+    传入 `session` 时复用调用方的连接池（不会关闭它）。
+    """
+    cached = _ME_CACHE.get(token)
+    if cached is not None:
+        return cached
+
+    url = f"{TELEGRAM_API_BASE}/bot{token}/getMe"
+    if session is None:
+        async with ClientSession(timeout=ClientTimeout(total=timeout)) as own_session:
+            me = await _request_me(own_session, url, timeout)
+    else:
+        me = await _request_me(session, url, timeout)
+
+    _ME_CACHE[token] = me
+    return me
+
+
+async def _request_me(session: ClientSession, url: str, timeout: float) -> Dict[str, Any]:
+    async with session.get(url, timeout=ClientTimeout(total=timeout)) as response:
+        if response.status != 200:
+            raise TelegramApiError(response.status)
+        data = await response.json()
+    if not data.get("ok"):
+        raise TelegramApiError(response.status, data.get("description"))
+    return data.get("result", {})
+
+
+def clear_me_cache() -> None:
+    """清空 getMe 缓存（主要供测试使用）"""
+    _ME_CACHE.clear()